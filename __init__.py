@@ -2,10 +2,8 @@ import importlib.util
 import glob
 import os
 import sys
-import filecmp
-import shutil
 import __main__
-from .dzNodes import init, get_ext_dir, log
+from .dzNodes import init, get_ext_dir, get_extension_config, update_node_status, sync_files
 
 NODE_CLASS_MAPPINGS = {}
 NODE_DISPLAY_NAME_MAPPINGS = {}
@@ -16,43 +14,35 @@ extentions_folder = os.path.join(os.path.dirname(os.path.realpath(__main__.__fil
 javascript_folder = os.path.join(os.path.dirname(os.path.realpath(__file__)), "mtb")
 outdate_file_list = ['comfy_shared.js', 'debug.js', 'mtb_widgets.js', 'parse-css.js', 'dz_widgets.js']
 
-if not os.path.exists(extentions_folder):
-    log('Making the "web\extensions\mtb" folder')
-    os.mkdir(extentions_folder)
-else:
-    for i in outdate_file_list:
-        outdate_file = os.path.join(extentions_folder, i)
-        if os.path.exists(outdate_file):
-            os.remove(outdate_file)
-
-result = filecmp.dircmp(javascript_folder, extentions_folder)
-
-if result.left_only or result.diff_files:
-    log('Update to javascripts files detected')
-    file_list = list(result.left_only)
-    file_list.extend(x for x in result.diff_files if x not in file_list)
-
-    for file in file_list:
-        log(f'WordCloud: Copying {file} to extensions folder')
-        src_file = os.path.join(javascript_folder, file)
-        dst_file = os.path.join(extentions_folder, file)
-        if os.path.exists(dst_file):
-            os.remove(dst_file)
-        #log("disabled")
-        shutil.copy(src_file, dst_file)
+# nothing is compared or copied when the manifest of the deployed files matches
+sync_files(javascript_folder, extentions_folder, remove=outdate_file_list)
 
 if init():
     py = get_ext_dir("py")
+    # node modules import their helpers by name, worker processes need to find them too
+    if py not in sys.path:
+        sys.path.append(py)
     files = glob.glob("*.py", root_dir=py, recursive=False)
     for file in files:
         name = os.path.splitext(file)[0]
-        spec = importlib.util.spec_from_file_location(name, os.path.join(py, file))
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[name] = module
-        spec.loader.exec_module(module)
+        path = os.path.join(py, file)
+        # a helper already imported by another node module must not be loaded twice
+        module = sys.modules.get(name)
+        if getattr(module, "__file__", None) != path:
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[name] = module
+            spec.loader.exec_module(module)
         if hasattr(module, "NODE_CLASS_MAPPINGS") and getattr(module, "NODE_CLASS_MAPPINGS") is not None:
             NODE_CLASS_MAPPINGS.update(module.NODE_CLASS_MAPPINGS)
             if hasattr(module, "NODE_DISPLAY_NAME_MAPPINGS") and getattr(module, "NODE_DISPLAY_NAME_MAPPINGS") is not None:
                 NODE_DISPLAY_NAME_MAPPINGS.update(module.NODE_DISPLAY_NAME_MAPPINGS)
+
+    # placement progress is shown on the node with the dzNodes status messages
+    sys.modules["wordcloud_progress"].set_status_sender(update_node_status)
+
+    # optional: load jieba's dictionary in the background instead of on the first execution
+    if get_extension_config().get("warmup", False):
+        sys.modules["wordcloud_engine"].warm_up()
         
 __all__ = ["NODE_CLASS_MAPPINGS", "NODE_DISPLAY_NAME_MAPPINGS"]
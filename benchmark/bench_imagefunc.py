@@ -0,0 +1,50 @@
+"""Tensor/PIL conversion cost against canvas size, next to the layout time of a small cloud.
+
+Run from the plugin directory: python benchmark/bench_imagefunc.py
+"""
+import os
+import sys
+import time
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py'))
+from wordcloud_imagefunc import pil2tensor, getRGBAmask, rgba2tensor
+from wordcloud_engine import render_wordcloud, text_to_frequencies
+
+FONT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'font', 'Alibaba-PuHuiTi-Heavy.ttf')
+
+def legacy_convert(image):
+    # the conversion used before wordcloud_imagefunc
+    ret_mask = torch.tensor([(torch.from_numpy(np.array(image).astype(np.float32) / 255.0).unsqueeze(0))[0, :, :, 3].tolist()])
+    return torch.from_numpy(np.array(image).astype(np.float32) / 255.0).unsqueeze(0), ret_mask
+
+def timeit(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    text = ' '.join(f'word{i % 300}' for i in range(5000))
+    start = time.perf_counter()
+    render_wordcloud(text_to_frequencies(text), dict(width=512, height=512, font_path=FONT, random_state=0))
+    layout = time.perf_counter() - start
+    print(f'layout + render 512x512: {layout * 1000:9.1f} ms')
+
+    print(f'{"size":>10} {"pixels":>12} {"rgba2tensor":>12} {"pil2tensor+mask":>16} {"legacy":>10} {"ns/pixel":>9}')
+    for size in (512, 1024, 2048, 4096):
+        array = np.random.randint(0, 256, (size, size, 4), dtype=np.uint8)
+        image = Image.fromarray(array)
+        t_new = timeit(rgba2tensor, [array])
+        t_pil = timeit(lambda: (pil2tensor(image), getRGBAmask(image)))
+        # the legacy path builds ~17M Python floats at 4096, skip it
+        legacy = f'{timeit(legacy_convert, image, repeat=1) * 1000:>8.1f}ms' if size <= 2048 else f'{"-":>10}'
+        print(f'{size:>10} {size * size:>12} {t_new * 1000:>10.1f}ms {t_pil * 1000:>14.1f}ms '
+              f'{legacy} {t_new * 1e9 / (size * size):>9.2f}')
+
+if __name__ == '__main__':
+    main()
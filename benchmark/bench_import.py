@@ -0,0 +1,58 @@
+"""Import time of the node modules, with the heavy packages blocked.
+
+Loading the plugin must not import torch, jieba, wordcloud or matplotlib, they are loaded on the first execution.
+Exits with an error if a module imports one of them, or takes longer than the budget.
+
+Run from the plugin directory: python benchmark/bench_import.py [budget in ms]
+"""
+import os
+import sys
+import glob
+import time
+import importlib
+import importlib.abc
+
+HEAVY_PACKAGES = ('torch', 'jieba', 'wordcloud', 'matplotlib', 'scipy', 'server')
+
+class BlockHeavyImports(importlib.abc.MetaPathFinder):
+    def __init__(self):
+        self.blocked = []
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname.split('.')[0] in HEAVY_PACKAGES:
+            self.blocked.append(fullname)
+            raise ImportError(f'{fullname} imported at module import time')
+        return None
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    py_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py')
+    sys.path.append(py_dir)
+    # already loaded by ComfyUI, not counted
+    import numpy
+    import PIL.Image
+
+    finder = BlockHeavyImports()
+    sys.meta_path.insert(0, finder)
+    failed = False
+    total = 0
+    for file in sorted(glob.glob('*.py', root_dir=py_dir)):
+        name = os.path.splitext(file)[0]
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            error = ''
+        except ImportError as e:
+            error = str(e)
+            failed = True
+        elapsed = (time.perf_counter() - start) * 1000
+        total += elapsed
+        print(f'{name:>24} {elapsed:8.1f} ms {error}')
+    print(f'{"total":>24} {total:8.1f} ms (budget {budget:.0f} ms)')
+    if finder.blocked:
+        print('heavy imports: ' + ', '.join(finder.blocked))
+    if failed or total > budget:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
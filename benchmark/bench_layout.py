@@ -0,0 +1,65 @@
+"""Stock against numpy placement engine, on an empty canvas and inside a circle mask.
+
+The numpy engine places words differently, it must place as many words and cover about as much of the canvas.
+A single seed says little, both engines stop at the first word that does not fit, the totals of several seeds are compared.
+Exits with an error if it falls behind the stock engine.
+
+Run from the plugin directory: python benchmark/bench_layout.py [size] [words] [seeds]
+"""
+import os
+import sys
+import time
+import random
+import numpy as np
+
+plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(plugin_dir, 'py'))
+from wordcloud import WordCloud
+import wordcloud_layout
+from wordcloud_fonts import default_font
+
+def random_frequencies(words, seed=0):
+    rnd = random.Random(seed)
+    return {''.join(rnd.choice('abcdefghijklmnop') for _ in range(rnd.randint(3, 9))): rnd.randint(1, 1000)
+            for _ in range(words)}
+
+def circle_mask(size):
+    mask = np.full((size, size, 3), 255, dtype=np.uint8)
+    y, x = np.mgrid[:size, :size]
+    mask[(y - size // 2) ** 2 + (x - size // 2) ** 2 < (size * 15 // 32) ** 2] = 0
+    return mask
+
+def run(engine, frequencies, size, words, mask, seeds):
+    elapsed, placed, coverage = 0, 0, 0
+    for seed in range(seeds):
+        wc = WordCloud(font_path=default_font, width=size, height=size, max_words=words,
+                       max_font_size=size // 7, random_state=seed, mask=mask)
+        start = time.perf_counter()
+        wordcloud_layout.generate_from_frequencies(wc, frequencies, engine=engine)
+        elapsed += time.perf_counter() - start
+        placed += len(wc.layout_)
+        coverage += float((np.asarray(wordcloud_layout.to_image(wc).convert('L')) > 0).mean()) / seeds
+    return elapsed, placed, coverage
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    seeds = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    frequencies = random_frequencies(words * 6 // 5)
+    run('numpy', frequencies, 256, 50, None, 1)  # load the font faces, not counted
+    failed = False
+    for name, mask in (('canvas', None), ('circle', circle_mask(size))):
+        stock = run('wordcloud', frequencies, size, words, mask, seeds)
+        vector = run('numpy', frequencies, size, words, mask, seeds)
+        print(f'{name} {size}x{size}, {words} words, {seeds} seeds')
+        for engine, (elapsed, placed, coverage) in (('wordcloud', stock), ('numpy', vector)):
+            print(f'  {engine:>9} {elapsed:7.2f}s {placed:6} placed  coverage {coverage:.3f}')
+        print(f'  speedup {stock[0] / vector[0]:.2f}x')
+        if vector[1] < stock[1] * 0.95 or vector[2] < stock[2] * 0.95:
+            print('  numpy engine places fewer words or covers less of the canvas')
+            failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Peak memory of rendering a print-size word cloud, with and without low_memory.
+
+Every mode runs in a new process, the peak is the growth of its resident memory while rendering an
+already placed layout (a batch of two with a contour), compared with the size of the IMAGE and MASK outputs (20 bytes per pixel).
+low_memory must stay within LIMIT times the outputs, the process exits with an error otherwise.
+
+Run from the plugin directory: python benchmark/bench_memory.py [canvas] [scale]
+Linux only, the resident memory is read from /proc.
+"""
+import os
+import sys
+import io
+import json
+import contextlib
+import subprocess
+
+plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(plugin_dir, 'py'))
+
+LIMIT = 1.25
+
+def peak_rss():
+    # VmHWM is the peak resident memory of the process, VmRSS the current one
+    with open('/proc/self/status') as f:
+        status = dict(line.split(':', 1) for line in f)
+    return int(status['VmHWM'].split()[0]) * 1024, int(status['VmRSS'].split()[0]) * 1024
+
+def reset_peak():
+    # writing 5 to clear_refs resets VmHWM to the current resident memory
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+def child(canvas, scale, low_memory):
+    import numpy as np
+    import torch
+    from comfy_wordcloud import place_words, draw_frames, layout_arguments, style_arguments
+    from wordcloud_fonts import default_font
+
+    rnd = np.random.default_rng(0)
+    words = {''.join(rnd.choice(list('abcdefghijklmnop'), rnd.integers(3, 10))): int(rnd.integers(1, 1000))
+             for _ in range(1000)}
+    layout_args = layout_arguments(canvas, canvas, 0, default_font, 4, canvas // 4, 0.5, 0.9, 1000, False)
+    style_args = style_arguments(scale, 'viridis', '#FFFFFF', True, 4, '#000000')
+    # a batch of two in a circle with its contour
+    mask = torch.ones(2, canvas, canvas, 3)
+    y, x = torch.meshgrid(torch.arange(canvas), torch.arange(canvas), indexing='ij')
+    mask[:, (y - canvas // 2) ** 2 + (x - canvas // 2) ** 2 < (canvas * 15 // 32) ** 2] = 0
+    with contextlib.redirect_stdout(io.StringIO()):  # the log lines of the nodes
+        frames = place_words([words], layout_args, random_state=0, mask_image=mask, layout_engine='numpy')
+        draw_frames(frames, style_arguments(1, 'viridis', '#FFFFFF', True, 0, '#000000'))  # fonts and torch loaded
+
+        reset_peak()
+        _, before = peak_rss()
+        image, mask = draw_frames(frames, style_args, low_memory=low_memory)
+        peak, _ = peak_rss()
+    output = image.numel() * image.element_size() + mask.numel() * mask.element_size()
+    print(json.dumps(dict(peak=peak - before, output=output)))
+
+def main():
+    canvas = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 8
+    size = int(canvas * scale)
+    print(f'{size}x{size} image, {canvas}x{canvas} canvas at scale {scale}')
+    failed = False
+    for low_memory in (False, True):
+        result = subprocess.run([sys.executable, __file__, '--child', str(canvas), str(scale), str(low_memory)],
+                                capture_output=True, text=True, check=True)
+        result = json.loads(result.stdout.strip().splitlines()[-1])
+        ratio = result['peak'] / result['output']
+        print(f'low_memory={low_memory!s:<6} peak {result["peak"] / 2 ** 20:8.1f} MB, '
+              f'outputs {result["output"] / 2 ** 20:8.1f} MB, {ratio:.2f}x')
+        if low_memory and ratio > LIMIT:
+            failed = True
+    if failed:
+        print(f'low_memory peak is above {LIMIT}x the outputs')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(int(sys.argv[2]), float(sys.argv[3]), sys.argv[4] == 'True')
+    else:
+        main()
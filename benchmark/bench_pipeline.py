@@ -0,0 +1,236 @@
+"""Word Cloud and Load Text File nodes on synthetic corpora, without ComfyUI.
+
+server.PromptServer is replaced by a stub, so dzNodes.py and the node modules import as in ComfyUI.
+Every case runs with empty caches: once under tracemalloc for the peak memory, then timed.
+The stage times come from the stats output of Word Cloud, Load Text File only has a total.
+
+    python benchmark/bench_pipeline.py                  run and compare with the baseline, if there is one
+    python benchmark/bench_pipeline.py --save           run and store the result as baseline
+    python benchmark/bench_pipeline.py --full           also the 1M token corpora
+    python benchmark/bench_pipeline.py --filter mask    only the cases with 'mask' in the name
+
+The baseline is machine specific, it is not committed. A case slower or larger than the baseline
+by more than the tolerance fails the run.
+"""
+import os
+import sys
+import io
+import json
+import time
+import types
+import random
+import shutil
+import argparse
+import contextlib
+import tempfile
+import functools
+import tracemalloc
+
+plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(plugin_dir, 'benchmark', 'pipeline_baseline.json')
+
+def stub_server():
+    # dzNodes.py sends the node status through PromptServer.instance, without client there is nothing to send
+    server = types.ModuleType('server')
+
+    class PromptServer(object):
+        instance = types.SimpleNamespace(client_id=None)
+
+    server.PromptServer = PromptServer
+    sys.modules['server'] = server
+
+stub_server()
+sys.path.append(plugin_dir)
+sys.path.append(os.path.join(plugin_dir, 'py'))
+import torch
+import dzNodes
+import wordcloud_cache
+import wordcloud_engine
+import wordcloud_mask
+import wordcloud_color
+import wordcloud_progress
+from comfy_wordcloud import ComfyWordCloud
+from load_textfile import LoadTextFile
+
+wordcloud_progress.set_status_sender(dzNodes.update_node_status)
+
+# synthetic corpora, tokens is the number of words before segmentation
+
+def vocabulary(rnd, size, letters='abcdefghijklmnopqrstuvwxyz'):
+    return list({''.join(rnd.choice(letters) for _ in range(rnd.randint(2, 10))) for _ in range(size)})
+
+def english(tokens, rnd):
+    words = rnd.choices(vocabulary(rnd, 3000), k=tokens)
+    return '\n'.join(' '.join(words[i:i + 20]) + '.' for i in range(0, tokens, 20))
+
+def zipf(tokens, rnd):
+    words = vocabulary(rnd, 50000)
+    words = rnd.choices(words, weights=[1 / (i + 1) ** 1.1 for i in range(len(words))], k=tokens)
+    return '\n'.join(' '.join(words[i:i + 20]) + '.' for i in range(0, tokens, 20))
+
+def chinese(tokens, rnd):
+    chars = [chr(x) for x in range(0x4e00, 0x4e00 + 3000)]
+    # about two characters per word after segmentation
+    return '\n'.join(''.join(rnd.choices(chars, k=40)) + '。' for _ in range(max(1, tokens // 20)))
+
+def mixed(tokens, rnd):
+    return '\n'.join(x + y for x, y in zip(english(tokens // 2, rnd).split('\n'),
+                                          chinese(tokens // 2, rnd).split('\n')))
+
+CORPORA = {'english': english, 'zipf': zipf, 'chinese': chinese, 'mixed': mixed}
+
+@functools.lru_cache(maxsize=None)
+def corpus(name, tokens):
+    return CORPORA[name](tokens, random.Random(tokens))
+
+def circle_mask(size):
+    # white background, the words go into the black circle
+    mask = torch.ones(1, size, size, 3)
+    y, x = torch.meshgrid(torch.arange(size), torch.arange(size), indexing='ij')
+    mask[0][(y - size // 2) ** 2 + (x - size // 2) ** 2 < (size * 15 // 32) ** 2] = 0
+    return mask
+
+NODE_DEFAULTS = dict(width=512, height=512, margin=0, scale=1, font_path='Alibaba-PuHuiTi-Heavy.ttf',
+                     min_font_size=4, max_font_size=128, relative_scaling=0.5, colormap='viridis',
+                     background_color='#FFFFFF', transparent_background=True, prefer_horizontal=0.9,
+                     max_words=200, repeat=False, include_numbers=False, random_state=1, stopwords='')
+
+def cases(full):
+    sizes = [1000, 10000, 100000] + ([1000000] if full else [])
+    for name in CORPORA:
+        for tokens in sizes:
+            yield f'{name}-{tokens}', 'node', dict(corpus=(name, tokens))
+    base = dict(corpus=('english', 10000))
+    for size in (512, 1024, 2048):
+        yield f'mask-{size}', 'node', dict(base, mask_image=('circle', size))
+    yield 'mask-2048-layout-512', 'node', dict(base, mask_image=('circle', 2048), layout_resolution=512)
+    for scale in (2, 4):
+        yield f'scale-{scale}', 'node', dict(base, scale=scale)
+    for max_words in (1000, 5000):
+        yield f'max_words-{max_words}', 'node', dict(base, max_words=max_words)
+    yield 'repeat', 'node', dict(corpus=('english', 1000), max_words=2000, repeat=True)
+    yield 'color_ref', 'node', dict(base, color_ref_image=('noise', 512))
+    yield 'color_ref-mask', 'node', dict(base, color_ref_image=('noise', 512), mask_image=('circle', 1024))
+    # 5 frames of a growing text, every frame has all lines of the one before
+    yield 'frames', 'node', dict(base, frames=5)
+    yield 'sequence', 'node', dict(base, frames=5, sequence=True)
+    for name in CORPORA:
+        tokens = sizes[-1]
+        yield f'load-{name}-{tokens}', 'load', dict(corpus=(name, tokens))
+        yield f'stream-{name}-{tokens}', 'load', dict(corpus=(name, tokens), streaming=True)
+
+STAGES = ['tokenize', 'word_settings', 'mask', 'placement', 'recolor', 'draw', 'contour', 'tensor']
+
+def clear_caches(cache_dir):
+    # every run starts cold: no frequencies on disk or in memory, no cached layouts, masks or references
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    wordcloud_cache._memory_cache.clear()
+    wordcloud_cache._known_digests.clear()
+    wordcloud_mask._known_tensors.clear()
+    for cache in (wordcloud_engine.layout_cache, wordcloud_mask.mask_cache, wordcloud_mask.contour_cache,
+                  wordcloud_color.reference_cache, wordcloud_color.table_cache):
+        cache.clear()
+
+def prepare(kind, params, work_dir):
+    params = dict(params)
+    text = corpus(*params.pop('corpus'))
+    if kind == 'load':
+        path = os.path.join(work_dir, 'corpus.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        def load():
+            LoadTextFile().load_text_file(path, **params)
+            return {}
+        return load
+    if 'frames' in params:
+        lines = text.split('\n')
+        frames = params.pop('frames')
+        text = '|'.join('\n'.join(lines[:len(lines) * (i + 1) // frames]) for i in range(frames))
+        params['batch_separator'] = '|'
+    if 'mask_image' in params:
+        params['mask_image'] = circle_mask(params['mask_image'][1])
+    if 'color_ref_image' in params:
+        params['color_ref_image'] = torch.rand(1, params['color_ref_image'][1], params['color_ref_image'][1], 3,
+                                               generator=torch.Generator().manual_seed(0))
+    kwargs = dict(NODE_DEFAULTS, text=text, collect_stats=True, **params)
+    return lambda: json.loads(ComfyWordCloud().wordcloud(**kwargs)[2])['stages']
+
+def run_case(kind, params, work_dir, repeat):
+    node_run = prepare(kind, params, work_dir)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):  # the log lines of the nodes
+            return node_run()
+
+    clear_caches(wordcloud_cache.cache_dir)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = None
+    for _ in range(repeat):
+        clear_caches(wordcloud_cache.cache_dir)
+        start = time.perf_counter()
+        stages = run()
+        total = time.perf_counter() - start
+        if best is None or total < best['total']:
+            best = dict(stages, total=total)
+    best['peak_mb'] = peak / 1024 / 1024
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--full', action='store_true', help='also the 1M token corpora')
+    parser.add_argument('--filter', default='', help='only cases with this in their name')
+    parser.add_argument('--repeat', type=int, default=1, help='timed runs per case, the best is kept')
+    parser.add_argument('--save', action='store_true', help='store the result as baseline')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 is 25%%')
+    args = parser.parse_args()
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    work_dir = tempfile.mkdtemp(prefix='wordcloud_bench_')
+    # the frequency cache of the plugin is left alone
+    wordcloud_cache.cache_dir = os.path.join(work_dir, 'cache')
+    wordcloud_cache.frequency_cache_dir = os.path.join(wordcloud_cache.cache_dir, 'frequencies')
+    wordcloud_cache.file_index_path = os.path.join(wordcloud_cache.cache_dir, 'file_index.json')
+    # jieba's dictionary and the fonts are loaded once per ComfyUI session, not counted
+    run_case('node', dict(corpus=('mixed', 1000)), work_dir, 1)
+
+    results = {}
+    regressions = []
+    stages = STAGES
+    print(f'{"case":<24}' + ''.join(f'{x:>14}' for x in stages + ['total']) + f'{"peak MB":>10}{"baseline":>10}')
+    try:
+        for name, kind, params in cases(args.full):
+            if args.filter not in name:
+                continue
+            result = run_case(kind, params, work_dir, args.repeat)
+            results[name] = result
+            ratio = ''
+            if name in baseline:
+                time_ratio = result['total'] / baseline[name]['total']
+                memory_ratio = result['peak_mb'] / max(baseline[name]['peak_mb'], 1)
+                ratio = f'{time_ratio:.2f}x'
+                if time_ratio > 1 + args.tolerance or memory_ratio > 1 + args.tolerance:
+                    regressions.append(f'{name}: {time_ratio:.2f}x time, {memory_ratio:.2f}x peak memory')
+                    ratio += ' !'
+            print(f'{name:<24}' + ''.join(f'{result.get(x, 0):13.3f}s' for x in stages + ['total'])
+                  + f'{result["peak_mb"]:10.1f}{ratio:>10}', flush=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+        print(f'baseline saved to {args.baseline}')
+    if regressions:
+        print('SLOWER THAN BASELINE:\n  ' + '\n  '.join(regressions))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Serial against parallel tokenization of large English and Chinese texts, and against jieba on all of the text.
+
+Run from the plugin directory: python benchmark/bench_tokenize.py [megabytes]
+"""
+import os
+import sys
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py'))
+import jieba
+from wordcloud import WordCloud
+from wordcloud_tokenize import count_text, count_chunk
+from wordcloud_engine import available_cpus
+
+def english_text(size, seed=0):
+    rnd = random.Random(seed)
+    vocabulary = [''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randint(2, 9)))
+                  for _ in range(5000)]
+    words = rnd.choices(vocabulary, weights=[1 / (i + 1) for i in range(len(vocabulary))], k=size // 6)
+    return '\n'.join(' '.join(words[i:i + 80]) + '.' for i in range(0, len(words), 80))
+
+def chinese_text(size, seed=0):
+    rnd = random.Random(seed)
+    chars = [chr(x) for x in range(0x4e00, 0x4e00 + 3000)]
+    sentences = [''.join(rnd.choices(chars, k=rnd.randint(8, 30))) + '。' for _ in range(2000)]
+    return '\n'.join(''.join(rnd.choices(sentences, k=20)) for _ in range(size // 400))
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 8
+    size = int(megabytes * 1024 * 1024)
+    jieba.initialize()
+    cpus = available_cpus()
+    workers_list = sorted(set([1, 2, 4, 8, 16, 32, cpus]) & set(range(1, cpus + 1)))
+    for name, text in (('english', english_text(size)), ('chinese', chinese_text(size // 3))):
+        start = time.perf_counter()
+        expected = WordCloud().process_text(' '.join(jieba.cut(text)))
+        everywhere = time.perf_counter() - start
+        start = time.perf_counter()
+        # only the Chinese text goes through jieba, the same words for these texts
+        result = count_text(text, False)
+        serial = time.perf_counter() - start
+        assert list(result.items()) == list(expected.items()), 'serial result differs'
+        print(f'{name}: {len(text)} chars, {len(expected)} words, serial {serial:.2f}s, '
+              f'jieba on all text {everywhere:.2f}s')
+        for workers in workers_list:
+            with ProcessPoolExecutor(workers) as executor:
+                executor.submit(count_chunk, '预热 warm up').result()  # exclude start-up, a ComfyUI pool is kept warm
+                start = time.perf_counter()
+                result = count_text(text, False, executor, workers * 4)
+                elapsed = time.perf_counter() - start
+            assert list(result.items()) == list(expected.items()), 'parallel result differs'
+            print(f'  {workers:>3} workers {elapsed:7.2f}s  speedup {serial / elapsed:5.2f}x')
+
+if __name__ == '__main__':
+    main()
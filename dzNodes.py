@@ -1,7 +1,9 @@
 import asyncio
 import os
+import re
 import json
 import shutil
+import hashlib
 import inspect
 import aiohttp
 from server import PromptServer
@@ -122,8 +124,90 @@ def install_js():
         log("JS linked")
         return
 
-    log("Copying JS files")
-    shutil.copytree(src_dir, dst_dir, dirs_exist_ok=True)
+    sync_files(src_dir, dst_dir)
+
+
+# The deployed web files are listed with their hashes in a manifest next to them. When the manifest
+# matches the extension, start-up doesn't read or compare the deployed files at all.
+MANIFEST_NAME = ".dzNodes_manifest.json"
+
+
+def get_extension_version():
+    try:
+        with open(get_ext_dir("pyproject.toml"), "r", encoding="utf-8") as f:
+            match = re.search(r'^version\s*=\s*"([^"]*)"', f.read(), re.MULTILINE)
+        return match.group(1) if match else None
+    except OSError:
+        return None
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def build_manifest(src_dir):
+    files = {}
+    for root, dirs, names in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, src_dir).replace(os.sep, "/")] = file_hash(path)
+    return {"version": get_extension_version(), "files": files}
+
+
+def read_manifest(dst_dir):
+    try:
+        with open(os.path.join(dst_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def replace_file(dst, write):
+    # written next to the target and renamed over it, a reader never sees half a file
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def sync_files(src_dir, dst_dir, remove=()):
+    """Copy the files of src_dir that differ from dst_dir, skipped when the manifest in dst_dir matches.
+
+    remove are outdated file names deleted from dst_dir on a sync. Returns the copied file names.
+    """
+    manifest = build_manifest(src_dir)
+    deployed = read_manifest(dst_dir)
+    if deployed == manifest:
+        log("JS files up to date")
+        return []
+
+    log("Update to javascripts files detected")
+    os.makedirs(dst_dir, exist_ok=True)
+    for name in remove:
+        path = os.path.join(dst_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    known = deployed["files"] if deployed and deployed.get("version") == manifest["version"] else {}
+    copied = []
+    for name, digest in manifest["files"].items():
+        dst = os.path.join(dst_dir, *name.split("/"))
+        if os.path.isfile(dst) and (known.get(name) or file_hash(dst)) == digest:
+            continue
+        log(f"Copying {name} to extensions folder")
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        replace_file(dst, lambda tmp: shutil.copy2(os.path.join(src_dir, *name.split("/")), tmp))
+        copied.append(name)
+
+    def write_manifest(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+    replace_file(os.path.join(dst_dir, MANIFEST_NAME), write_manifest)
+    return copied
 
 
 def init(check_imports=None):
@@ -1,13 +1,19 @@
 import math
 import os
-import glob
-import re
+import json
+import time
+import random
 import numpy as np
-import torch
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud, STOPWORDS, ImageColorGenerator
-from PIL import Image, ImageChops
-import jieba
+from wordcloud_fonts import get_font_list, get_font_path
+from wordcloud_layout import LAYOUT_ENGINES, PICK_MODES, layout_scores, scale_layout
+from wordcloud_engine import render_batch, render_batch_tiled, render_sequence, text_to_frequencies, apply_word_settings, layout_cache, layout_key, \
+    styled_wordcloud, canvas_size, resolve_frequencies
+from wordcloud_svg import to_svg, svg_file_names
+from wordcloud_mask import prepare_masks, shrink_mask, mask_cache
+from wordcloud_color import prepare_references
+from wordcloud_progress import NodeProgress
+from wordcloud_stats import Timings, null_timings
+from wordcloud_imagefunc import rgba2tensor, float2tensor
 
 def log(message):
     name = 'WordCloud'
@@ -27,49 +33,388 @@ COLOR_MAP = ['viridis', 'Accent', 'Blues', 'BrBG', 'BuGn', 'BuPu', 'CMRmap', 'Da
              ]
 
 default_text = 'demo of word cloud for ComfyUI by dzNodes'
-font_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.normpath(__file__))), 'font')
-ini_file = os.path.join(os.path.dirname(os.path.dirname(os.path.normpath(__file__))), "font_dir.ini")
-
-try:
-    with open(ini_file, 'r') as f:
-        ini = f.read()
-        d = ini[ini.find('=') + 1:].rstrip().lstrip()
-        if os.path.exists(d):
-            font_dir = d
+
+# The stages of a word cloud. Word Cloud runs all of them, the Word Frequencies, Word Cloud Layout and
+# Word Cloud Render nodes one each, so ComfyUI only executes the stages whose inputs changed.
+
+def make_frequencies(text, include_numbers=False, stopwords='', keynote_words='', keynote_weight=60,
+                     batch_separator='', word_frequencies=None, tokenizer=None, timings=null_timings):
+    """Word frequencies of every frame, from text split by batch_separator or from word_frequencies."""
+    if word_frequencies is not None:
+        # one dict, or a list of them, one per frame
+        word_frequencies = resolve_frequencies(word_frequencies)
+        snapshots = [word_frequencies] if isinstance(word_frequencies, dict) else word_frequencies
+        return [apply_word_settings(dict(x), stopwords, keynote_words, keynote_weight, timings, tokenizer)
+                for x in snapshots]
+    if text == '':
+        text = default_text
+        log(f"text input not found, use demo string.")
+    texts = [text]
+    if batch_separator:
+        texts = [x for x in text.split(batch_separator) if x.strip() != ''] or [default_text]
+    return [text_to_frequencies(x, include_numbers, stopwords, keynote_words, keynote_weight, timings, tokenizer)
+            for x in texts]
+
+def layout_arguments(width, height, margin, font_path, min_font_size, max_font_size, relative_scaling,
+                     prefer_horizontal, max_words, repeat):
+    # WordCloud arguments that change where the words are placed, random_state is set per frame
+    return dict(width=width, height=height, margin=margin, font_path=get_font_path(font_path),
+                min_font_size=min_font_size, max_font_size=max_font_size, relative_scaling=relative_scaling,
+                prefer_horizontal=prefer_horizontal, max_words=max_words, repeat=repeat)
+
+def style_arguments(scale, colormap, background_color, transparent_background, contour_width, contour_color):
+    # WordCloud arguments that only change how the placed words are drawn
+    # 透明背景时background_color强制为None
+    return dict(scale=scale, colormap=colormap, mode='RGBA' if transparent_background else 'RGB',
+                background_color=None if transparent_background else background_color,
+                contour_width=contour_width, contour_color=contour_color)
+
+# margin on a shrunk canvas, WordCloud offsets the words by margin // 2, so 2 keeps a pixel free all around
+# them, the truncated positions of the full size layout stay apart
+LAYOUT_MARGIN = 2
+
+def layout_canvas(layout_args, mask=None, mask_key=None, layout_resolution=0):
+    """(layout_args, mask, mask_key, ratio_y, ratio_x) of the canvas to place the words on.
+
+    A canvas with a longer side above layout_resolution is shrunk to it, with the margin and font sizes,
+    the ratios map the layout back to the full size. 0 keeps the canvas.
+    """
+    height, width = mask.shape[:2] if mask is not None else (layout_args['height'], layout_args['width'])
+    if not layout_resolution or max(height, width) <= layout_resolution:
+        return layout_args, mask, mask_key, 1, 1
+    factor = layout_resolution / max(height, width)
+    size = (max(1, round(height * factor)), max(1, round(width * factor)))
+    ratio_y, ratio_x = height / size[0], width / size[1]
+    ratio = min(ratio_y, ratio_x)
+    layout_args = dict(layout_args, height=size[0], width=size[1], margin=max(LAYOUT_MARGIN, math.ceil(layout_args['margin'] / ratio)),
+                       min_font_size=max(1, round(layout_args['min_font_size'] / ratio)),
+                       max_font_size=max(1, round(layout_args['max_font_size'] / ratio)))
+    if mask is not None:
+        mask_key, mask = shrink_mask(mask, size, mask_key)
+    return layout_args, mask, mask_key, ratio_y, ratio_x
+
+def place_words(frequencies, layout_args, random_state=-1, mask_image=None, layout_engine='wordcloud',
+                time_budget=0, sequence=False, count=1, unique_id=None, timings=null_timings,
+                candidates=1, pick='all', layout_resolution=0):
+    """Frames of placed words, one per item of frequencies and mask_image and at least count.
+
+    A frame is a dict of the layout and of the canvas it was placed on, all draw_frames needs.
+    With candidates every frame is laid out with that many seeds at once, pick keeps the best of
+    them by one of layout_scores, or all of them one after the other. With layout_resolution the
+    words are placed on a smaller canvas, the layout is mapped back to the full size.
+    """
+    if isinstance(frequencies, dict):
+        frequencies = [frequencies]
+    with timings.stage('mask'):
+        # binarized once per mask tensor, a mask reused for other texts costs nothing
+        mask_keys, masks = prepare_masks(mask_image, timings)
+        canvases = [layout_canvas(layout_args, mask, key, layout_resolution) for mask, key in zip(masks, mask_keys)]
+    if sequence and candidates > 1:
+        log(f"a sequence is laid out with one seed, candidates ignored.")
+        candidates = 1
+    # the words kept from frame to frame keep their colors too, an unseeded sequence draws one seed for them
+    color_seed = random.randrange(2 ** 32) if random_state == -1 else random_state
+
+    # one frame per batch item, inputs with a single item are shared by all frames
+    batch_size = max(len(frequencies), len(masks), count)
+    frames = []
+    keys = []
+    full_sizes = []
+    for i, candidate in ((i, c) for i in range(batch_size) for c in range(candidates)):
+        # the first candidate has the seed of a single layout, the others follow the seeds of the batch
+        seed = None if random_state == -1 else random_state + i + candidate * batch_size
+        canvas_args, mask, mask_key, ratio_y, ratio_x = canvases[i % len(canvases)]
+        wc_args = dict(canvas_args, random_state=seed)
+        frame = dict(frequencies=frequencies[i % len(frequencies)], wc_args=wc_args, mask=mask, mask_key=mask_key)
+        if sequence:
+            frame['color_seed'] = color_seed
+        # the full size canvas for draw_frames, None when the words are placed on it
+        full_sizes.append(None if canvas_args is layout_args else
+                          (dict(layout_args, random_state=seed), masks[i % len(masks)], mask_keys[i % len(mask_keys)],
+                           ratio_y, ratio_x))
+        # same words and placement settings, only the style changed: reuse the layout
+        # in a sequence the layout also depends on the frames before
+        previous_key = keys[-1] if sequence and i > 0 else None
+        keys.append(layout_key(frame['frequencies'], wc_args, frame['mask'], layout_engine, frame['mask_key'],
+                               previous_key))
+        frame['layout'] = layout_cache.get(keys[-1]) if keys[-1] is not None else None
+        timings.count('layout_cache_misses' if frame['layout'] is None else 'layout_cache_hits')
+        frames.append(frame)
+    if len(frames) > 1:
+        log(f"lay out {len(frames)} word clouds.")
+
+    jobs = [dict(frame, layout_engine=layout_engine, time_budget=time_budget, draw=False) for frame in frames]
+    progress = NodeProgress(unique_id, len(frames))
+    try:
+        if sequence:
+            results = render_sequence(jobs, progress, timings)
         else:
-            log(f'ERROR: invalid dir, default to be used. check {ini_file}')
-except Exception as e:
-    log(f'ERROR: {ini_file} ' + repr(e))
-
-file_list = glob.glob(font_dir + '/*.ttf')
-file_list.extend(glob.glob(font_dir + '/*.otf'))
-font_dict = {}
-for i in range(len(file_list)):
-    _, filename =  os.path.split(file_list[i])
-    font_dict[filename] = file_list[i]
-font_list = list(font_dict.keys())
-log(f'find {len(font_list)} fonts in {font_dir}')
-
-# Tensor to PIL
-def tensor2pil(image):
-    return Image.fromarray(np.clip(255. * image.cpu().numpy().squeeze(), 0, 255).astype(np.uint8))
-
-# PIL to Tensor
-def pil2tensor(image):
-    return torch.from_numpy(np.array(image).astype(np.float32) / 255.0).unsqueeze(0)
-
-def getRGBAmask(image):
-    ret_mask = torch.tensor([pil2tensor(image)[0, :, :, 3].tolist()])
-    return ret_mask
-
-def img_whitebackground(image):
-    if image.mode != 'RGBA':
-        image = image.convert('RGBA')
-    width = image.width
-    height = image.height
-    img_new = Image.new('RGB', size=(width, height), color=(255, 255, 255))
-    img_new.paste(image, (0, 0), mask=image)
-    return img_new
+            # only the frames without cached layout go to the process pool
+            results = [(None, frame['layout'], True) for frame in frames]
+            todo = [i for i, frame in enumerate(frames) if frame['layout'] is None]
+            for i, result in zip(todo, render_batch([jobs[i] for i in todo], progress, timings)):
+                results[i] = result
+    finally:
+        progress.finish()
+    cut_short = False
+    for key, frame, full_size, (_, layout, complete) in zip(keys, frames, full_sizes, results):
+        # a partial layout is not cached, in a sequence neither are the frames built on it
+        cut_short = (cut_short and sequence) or not complete
+        if key is not None and frame['layout'] is None and not cut_short:
+            layout_cache.put(key, layout)
+        words = min(len(frame['frequencies']), frame['wc_args']['max_words'])
+        timings.count('words_placed', len(layout))
+        timings.count('words_dropped', max(0, words - len(layout)))
+        if candidates > 1 and pick != 'all':
+            mask = frame['mask']
+            if mask is not None:
+                free_pixels = mask.size - np.count_nonzero(mask)
+            else:
+                free_pixels = frame['wc_args']['width'] * frame['wc_args']['height']
+            frame['scores'] = layout_scores(layout, layout_args['font_path'], words, free_pixels)
+        # only what draw_frames needs, the colors are drawn again there
+        del frame['frequencies']
+        frame['layout'] = [(word_freq, font_size, position, orientation, None)
+                           for word_freq, font_size, position, orientation, _ in layout]
+        if full_size is not None:
+            frame['wc_args'], frame['mask'], frame['mask_key'], ratio_y, ratio_x = full_size
+            frame['layout'] = scale_layout(frame['layout'], ratio_y, ratio_x, layout_args['font_path'])
+    if any(x is not None for x in keys):
+        log(repr(layout_cache))
+    if mask_image is not None:
+        log(repr(mask_cache))
+    if candidates > 1 and pick != 'all':
+        frames = [pick_best(frames[i:i + candidates], pick) for i in range(0, len(frames), candidates)]
+    return frames
+
+def pick_best(candidates, pick):
+    # ties go to the one placing more words, then to the one covering more
+    best = max(candidates, key=lambda x: (x['scores'][pick], x['scores']['words_placed'], x['scores']['coverage']))
+    log(f"seed {best['wc_args']['random_state']} picked of {len(candidates)} candidates, "
+        + ', '.join(f'{k} {v:.3g}' for k, v in best['scores'].items()))
+    del best['scores']
+    return best
+
+def draw_frames(frames, style_args, color_ref_image=None, unique_id=None, timings=null_timings, low_memory=False):
+    """Render the frames of place_words, one image per frame and color_ref_image item. Returns (IMAGE, MASK).
+
+    With low_memory the images are drawn in bands straight into the output tensors, one after the other.
+    """
+    with timings.stage('mask'):
+        color_ref_keys, color_refs = prepare_references(color_ref_image)
+    batch_size = max(len(frames), len(color_refs))
+    jobs = []
+    for i in range(batch_size):
+        frame = frames[i % len(frames)]
+        jobs.append(dict(frequencies=None, wc_args=dict(frame['wc_args'], **style_args), mask=frame['mask'],
+                         mask_key=frame['mask_key'], layout=frame['layout'], color_seed=frame.get('color_seed'),
+                         color_ref=color_refs[i % len(color_refs)], color_ref_key=color_ref_keys[i % len(color_ref_keys)]))
+    progress = NodeProgress(unique_id, batch_size)
+    try:
+        if low_memory:
+            return tuple(float2tensor(x) for x in render_batch_tiled(jobs, progress, timings))
+        results = render_batch(jobs, progress, timings)
+    finally:
+        progress.finish()
+    with timings.stage('tensor'):
+        return rgba2tensor([x[0] for x in results])
+
+def svg_frames(frames, style_args, color_ref_image=None, embed_font=False, timings=null_timings):
+    """SVG strings of the frames of place_words, one per frame and color_ref_image item, nothing is rasterized."""
+    with timings.stage('mask'):
+        color_ref_keys, color_refs = prepare_references(color_ref_image)
+    svgs = []
+    for i in range(max(len(frames), len(color_refs))):
+        frame = frames[i % len(frames)]
+        wc = styled_wordcloud(dict(frame['wc_args'], **style_args), frame['layout'], frame['mask'],
+                              color_refs[i % len(color_refs)], color_ref_keys[i % len(color_ref_keys)], timings,
+                              frame.get('color_seed'))
+        with timings.stage('draw'):
+            svgs.append(to_svg(wc, embed_font))
+    return svgs
+
+class WordCloudFrequencies:
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(self):
+
+        return {
+            "required": {
+                "text": ("STRING", {"default": "", "multiline": True}),  # 文本内容
+                "include_numbers": ("BOOLEAN", {"default": False}),  # 是否包含数字
+                "stopwords": ("STRING", {"default": ""}),  # 排除词，用中英文逗号或空格分开
+            },
+            "optional": {
+                "keynote_words": ("STRING", {"default": ""}),  # 重点词，用中英文逗号或空格分开
+                "keynote_weight": ("INT", {"default": 60}),  # 重点词加权
+                "batch_separator": ("STRING", {"default": ""}),  # 非空时按此分隔text，每段生成一帧
+                "word_frequencies": ("WORD_FREQUENCIES",),  # 来自Load Text File的词频，有输入时取代text
+                "tokenizer": ("WORDCLOUD_TOKENIZER",),  # 来自Load Tokenizer的自定义词典和停用词表
+            },
+        }
+
+    RETURN_TYPES = ("WORD_FREQUENCIES",)
+    RETURN_NAMES = ("word_frequencies",)
+    FUNCTION = 'frequencies'
+    CATEGORY = '😺dzNodes/WordCloud'
+
+    def frequencies(self, text, include_numbers, stopwords, keynote_words='', keynote_weight=60,
+                    batch_separator='', word_frequencies=None, tokenizer=None):
+        return (make_frequencies(text, include_numbers, stopwords, keynote_words, keynote_weight,
+                                 batch_separator, word_frequencies, tokenizer),)
+
+class WordCloudLayout:
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(self):
+
+        return {
+            "required": {
+                "word_frequencies": ("WORD_FREQUENCIES",),  # 来自Word Frequencies或Load Text File的词频
+                ## size
+                "width": ("INT", {"default": 512}),  # 画幅宽
+                "height": ("INT", {"default": 512}),  # 画幅高
+                "margin": ("INT", {"default": 0}),  # 空白边界
+                ## font
+                "font_path": (get_font_list(),),  # 字体文件
+                "min_font_size": ("INT", {"default": 4}),  # 单词最小size
+                "max_font_size": ("INT", {"default": 128}),  # 单词最大size
+                "relative_scaling": ("FLOAT", {"default": 0.5, "min": 0.01, "max": 1.0, "step": 0.01}),  # 单词大小离散度
+                ## word control
+                "prefer_horizontal": ("FLOAT", {"default": 0.9, "min": 0.0, "max": 1.0, "step": 0.01}),  # 横排比例
+                "max_words": ("INT", {"default": 200}),  # 最大单词数量
+                "repeat": ("BOOLEAN", {"default": False}),  # 允许重复单词直到最大单词数量
+                "random_state": ("INT", {"default": -1, "min": -1, "max": 0xffffffffffffffff}),  # 固定随机值，-1时强制转为None（随机）
+            },
+            "optional": {
+                "mask_image": ("IMAGE", ),  # 有输入mask则强制使用该图尺寸，白底或带alpha通道
+                "layout_engine": (LAYOUT_ENGINES,),  # 排版算法，numpy在大画幅多单词时更快
+                "time_budget": ("FLOAT", {"default": 0, "min": 0, "max": 3600, "step": 0.1}),  # 每帧排版限时(秒)，超时输出已排好的单词，0为不限
+                "sequence": ("BOOLEAN", {"default": False}),  # 批量各帧为连续序列，已排好的单词保持位置，只排新增或变化的单词
+                "candidates": ("INT", {"default": 1, "min": 1, "max": 64}),  # 每帧用不同随机值同时排版的候选数
+                "pick": (PICK_MODES,),  # all输出全部候选，其余按该指标只保留最好的一个
+                "layout_resolution": ("INT", {"default": 0, "min": 0, "max": 16384}),  # 排版画幅长边像素，大于此值的mask缩小排版再按原尺寸渲染，0为不缩小
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
+            }
+        }
+
+    RETURN_TYPES = ("WORDCLOUD_LAYOUT",)
+    RETURN_NAMES = ("layout",)
+    FUNCTION = 'layout'
+    CATEGORY = '😺dzNodes/WordCloud'
+
+    def layout(self, word_frequencies, width, height, margin, font_path, min_font_size, max_font_size,
+               relative_scaling, prefer_horizontal, max_words, repeat, random_state,
+               mask_image=None, layout_engine='wordcloud', time_budget=0, sequence=False,
+               candidates=1, pick='all', layout_resolution=0, unique_id=None):
+        layout_args = layout_arguments(width, height, margin, font_path, min_font_size, max_font_size,
+                                       relative_scaling, prefer_horizontal, max_words, repeat)
+        return (place_words(resolve_frequencies(word_frequencies), layout_args, random_state, mask_image, layout_engine,
+                            time_budget, sequence, unique_id=unique_id, candidates=candidates, pick=pick,
+                            layout_resolution=layout_resolution),)
+
+class WordCloudRender:
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(self):
+
+        return {
+            "required": {
+                "layout": ("WORDCLOUD_LAYOUT",),  # 来自Word Cloud Layout的排版
+                "scale": ("FLOAT", {"default": 1, "min": 0.1, "max": 1000.0, "step": 0.01}),  # 放大倍数
+                ## color control
+                "colormap": (COLOR_MAP,),  # 文字颜色
+                "background_color": ("STRING", {"default": "#FFFFFF"}),  # 背景颜色
+                "transparent_background": ("BOOLEAN", {"default": True}),  # 是否透明，如果是则需要background_color强制为None
+            },
+            "optional": {
+                ## recolor refrence image
+                "color_ref_image": ("IMAGE", ),
+                "contour_width": ("FLOAT", {"default": 0, "min": 0, "max": 9999, "step": 0.1}),
+                "contour_color": ("STRING", {"default": "#000000"}),
+                "low_memory": ("BOOLEAN", {"default": False}),  # 分块渲染并直接写入输出，超大画幅时节省内存
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE", "MASK",)
+    RETURN_NAMES = ("image", "mask",)
+    FUNCTION = 'render'
+    CATEGORY = '😺dzNodes/WordCloud'
+    OUTPUT_NODE = True
+
+    def render(self, layout, scale, colormap, background_color, transparent_background,
+               color_ref_image=None, contour_width=0, contour_color='#000000', low_memory=False, unique_id=None):
+        style_args = style_arguments(scale, colormap, background_color, transparent_background,
+                                     contour_width, contour_color)
+        return draw_frames(layout, style_args, color_ref_image, unique_id, low_memory=low_memory)
+
+class WordCloudSVG:
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(self):
+
+        return {
+            "required": {
+                "layout": ("WORDCLOUD_LAYOUT",),  # 来自Word Cloud Layout的排版
+                "scale": ("FLOAT", {"default": 1, "min": 0.1, "max": 1000.0, "step": 0.01}),  # 放大倍数
+                ## color control
+                "colormap": (COLOR_MAP,),  # 文字颜色
+                "background_color": ("STRING", {"default": "#FFFFFF"}),  # 背景颜色
+                "transparent_background": ("BOOLEAN", {"default": True}),  # 是否透明，如果是则不输出背景
+                "svg_path": ("STRING", {"default": ""}),  # 保存svg的文件路径，批量时自动编号，为空则不保存
+            },
+            "optional": {
+                ## recolor refrence image
+                "color_ref_image": ("IMAGE", ),
+                "contour_width": ("FLOAT", {"default": 0, "min": 0, "max": 9999, "step": 0.1}),
+                "contour_color": ("STRING", {"default": "#000000"}),
+                "embed_font": ("BOOLEAN", {"default": False}),  # 将用到的字形嵌入svg，需要fontTools
+                "preview_size": ("INT", {"default": 512, "min": 16, "max": 4096}),  # 预览图长边像素
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "IMAGE",)
+    RETURN_NAMES = ("svg", "preview",)
+    OUTPUT_IS_LIST = (True, False,)
+    FUNCTION = 'svg'
+    CATEGORY = '😺dzNodes/WordCloud'
+    OUTPUT_NODE = True
+
+    def svg(self, layout, scale, colormap, background_color, transparent_background, svg_path,
+            color_ref_image=None, contour_width=0, contour_color='#000000', embed_font=False, preview_size=512):
+        style_args = style_arguments(scale, colormap, background_color, transparent_background,
+                                     contour_width, contour_color)
+        svgs = svg_frames(layout, style_args, color_ref_image, embed_font)
+        if svg_path.strip():
+            paths = svg_file_names(os.path.normpath(svg_path.strip()), len(svgs))
+            os.makedirs(os.path.dirname(os.path.abspath(paths[0])), exist_ok=True)
+            for path, svg in zip(paths, svgs):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(svg)
+            log(f"{len(paths)} svg saved to {paths[0]}")
+        # the raster preview at a small scale, its contour as thick as in the full size image
+        preview_scale = preview_size / max(canvas_size(layout[0]['wc_args'], layout[0]['mask']))
+        preview_args = style_arguments(preview_scale, colormap, background_color, transparent_background,
+                                       contour_width * preview_scale / scale, contour_color)
+        preview, _ = draw_frames(layout, preview_args, color_ref_image)
+        return (svgs, preview,)
 
 class ComfyWordCloud:
 
@@ -88,7 +433,7 @@ class ComfyWordCloud:
                 "scale": ("FLOAT", {"default": 1, "min": 0.1, "max": 1000.0, "step": 0.01}),  # 放大倍数
                 "margin": ("INT", {"default": 0}),  # 空白边界
                 ## font
-                "font_path": (font_list,),  # 字体文件
+                "font_path": (get_font_list(),),  # 字体文件
                 "min_font_size": ("INT", {"default": 4}),  # 单词最小size
                 "max_font_size": ("INT", {"default": 128}),  # 单词最大size
                 "relative_scaling": ("FLOAT", {"default": 0.5, "min": 0.01, "max": 1.0, "step": 0.01}),  # 单词大小离散度
@@ -113,11 +458,25 @@ class ComfyWordCloud:
                 "contour_color": ("STRING", {"default": "#000000"}),
                 "keynote_words": ("STRING", {"default": ""}),  # 重点词，用中英文逗号或空格分开
                 "keynote_weight": ("INT", {"default": 60}),  # 重点词加权
+                "batch_separator": ("STRING", {"default": ""}),  # 非空时按此分隔text，每段生成一帧
+                "word_frequencies": ("WORD_FREQUENCIES",),  # 来自Load Text File的词频，有输入时取代text
+                "layout_engine": (LAYOUT_ENGINES,),  # 排版算法，numpy在大画幅多单词时更快
+                "time_budget": ("FLOAT", {"default": 0, "min": 0, "max": 3600, "step": 0.1}),  # 每帧排版限时(秒)，超时输出已排好的单词，0为不限
+                "collect_stats": ("BOOLEAN", {"default": False}),  # 输出各阶段耗时等统计(JSON)，并写入日志
+                "sequence": ("BOOLEAN", {"default": False}),  # 批量各帧为连续序列，已排好的单词保持位置，只排新增或变化的单词
+                "tokenizer": ("WORDCLOUD_TOKENIZER",),  # 来自Load Tokenizer的自定义词典和停用词表，分词时即排除停用词
+                "low_memory": ("BOOLEAN", {"default": False}),  # 分块渲染并直接写入输出，超大画幅时节省内存
+                "candidates": ("INT", {"default": 1, "min": 1, "max": 64}),  # 每帧用不同随机值同时排版的候选数
+                "pick": (PICK_MODES,),  # all输出全部候选，其余按该指标只保留最好的一个
+                "layout_resolution": ("INT", {"default": 0, "min": 0, "max": 16384}),  # 排版画幅长边像素，大于此值的mask缩小排版再按原尺寸渲染，0为不缩小
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             }
         }
 
-    RETURN_TYPES = ("IMAGE", "MASK",)
-    RETURN_NAMES = ("image", "mask",)
+    RETURN_TYPES = ("IMAGE", "MASK", "STRING",)
+    RETURN_NAMES = ("image", "mask", "stats",)
     FUNCTION = 'wordcloud'
     CATEGORY = '😺dzNodes/WordCloud'
     OUTPUT_NODE = True
@@ -128,91 +487,50 @@ class ComfyWordCloud:
                   prefer_horizontal, max_words, repeat,
                   include_numbers, random_state, stopwords,
                   color_ref_image=None, mask_image=None,
-                  contour_width=None, contour_color=None,
-                  keynote_words=None, keynote_weight=None,
+                  contour_width=0, contour_color='#000000',
+                  keynote_words='', keynote_weight=60, batch_separator='',
+                  word_frequencies=None, layout_engine='wordcloud', time_budget=0,
+                  collect_stats=False, sequence=False, tokenizer=None, low_memory=False,
+                  candidates=1, pick='all', layout_resolution=0, unique_id=None,
                   ):
-
-        # parameter preprocessing
-        if text == '':
-            text = default_text
-            log(f"text input not found, use demo string.")
-
-        freq_dict = WordCloud().process_text(' '.join(jieba.cut(text)))
-        if not keynote_words == '':
-            keynote_list = list(re.split(r'[，,\s*]', keynote_words))
-            keynote_list = [x for x in keynote_list if x != '']  # 去除空字符
-            keynote_dict = {keynote_list[i]: keynote_weight + max(freq_dict.values()) for i in range(len(keynote_list))}
-            freq_dict.update(keynote_dict)
-        log(f"word frequencies dict generated, include {len(freq_dict)} words.")
-
-
-        font_path = font_dict[font_path]
-        if not os.path.exists(font_path):
-            font_path = os.path.join(os.path.join(os.path.dirname(os.path.dirname(os.path.normpath(__file__))), 'font'),
-                                     'Alibaba-PuHuiTi-Heavy.ttf')
-            log(f"font_path not found, use {font_path}")
-        else:
-            log(f"font_path = {font_path}")
-
-        stopwords_set = set("")
-        if not stopwords == "":
-            stopwords_list = re.split(r'[，,\s*]', stopwords)
-            stopwords_set = set([x for x in stopwords_list if x != ''])  # 去除空字符
-            
-            # 同时在词典中删除（stopwords之bug）
-            for item in stopwords_set:
-                if item in freq_dict.keys():
-                    del freq_dict[item]
-
-        bg_color = background_color
-        mode = 'RGB'
-        if transparent_background:
-            bg_color = None
-            mode = 'RGBA'
-
-        if random_state == -1:
-            random_state = None
-
-        mask = None
-        image_width = width
-        image_height = height
-        if not mask_image == None:
-            p_mask = tensor2pil(mask_image)
-            mask = np.array(img_whitebackground(p_mask))
-            image_width = p_mask.width
-            image_height = p_mask.height
-
-
-        # set wordcloud parameters
-        wc = WordCloud(width=width, height=height, scale=scale, margin=margin,
-                       font_path=font_path, min_font_size=min_font_size, max_font_size=max_font_size,
-                       relative_scaling=relative_scaling, colormap=colormap, mode=mode,
-                       background_color=bg_color, prefer_horizontal=prefer_horizontal,
-                       max_words=max_words, repeat=repeat, include_numbers=include_numbers,
-                       random_state=random_state, stopwords=stopwords_set,
-                       mask=mask, contour_width=contour_width, contour_color=contour_color,
-                       )
-
-        # generate wordcloud
-        wc.generate_from_frequencies(freq_dict)
-
-        # generate recolor
-        if not color_ref_image == None:
-            p_color_ref_image = tensor2pil(color_ref_image)
-            p_color_ref_image = p_color_ref_image.resize((image_width, image_height))
-            image_colors = ImageColorGenerator(np.array(p_color_ref_image))
-            wc.recolor(color_func=image_colors)
-
-        ret_image = wc.to_image().convert('RGBA')
-        ret_mask = getRGBAmask(ret_image)
-
-        return (pil2tensor(ret_image), ret_mask,)
+        start_time = time.perf_counter()
+        timings = Timings(collect_stats)
+
+        # the stages of the Word Frequencies, Word Cloud Layout and Word Cloud Render nodes
+        frequencies = make_frequencies(text, include_numbers, stopwords, keynote_words, keynote_weight,
+                                       batch_separator, word_frequencies, tokenizer, timings)
+        layout_args = layout_arguments(width, height, margin, font_path, min_font_size, max_font_size,
+                                       relative_scaling, prefer_horizontal, max_words, repeat)
+        # one layout per color_ref_image item too, each with its own seed
+        count = 1 if color_ref_image is None else color_ref_image.shape[0]
+        frames = place_words(frequencies, layout_args, random_state, mask_image, layout_engine, time_budget,
+                             sequence, count, unique_id, timings, candidates, pick, layout_resolution)
+        style_args = style_arguments(scale, colormap, background_color, transparent_background,
+                                     contour_width, contour_color)
+        ret_image, ret_mask = draw_frames(frames, style_args, color_ref_image, unique_id, timings, low_memory)
+        batch_size = ret_image.shape[0]
+
+        stats = ''
+        if collect_stats:
+            # one line of json, for log scrapers
+            stats = json.dumps(dict(node='ComfyWordCloud', images=batch_size, layout_engine=layout_engine,
+                                    total=round(time.perf_counter() - start_time, 6), **timings.as_dict()))
+            log(f"stats {stats}")
+        return (ret_image, ret_mask, stats,)
 
 
 NODE_CLASS_MAPPINGS = {
-    "ComfyWordCloud": ComfyWordCloud
+    "ComfyWordCloud": ComfyWordCloud,
+    "WordCloudFrequencies": WordCloudFrequencies,
+    "WordCloudLayout": WordCloudLayout,
+    "WordCloudRender": WordCloudRender,
+    "WordCloudSVG": WordCloudSVG,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "ComfyWordCloud": "Word Cloud"
+    "ComfyWordCloud": "Word Cloud",
+    "WordCloudFrequencies": "Word Frequencies",
+    "WordCloudLayout": "Word Cloud Layout",
+    "WordCloudRender": "Word Cloud Render",
+    "WordCloudSVG": "Word Cloud SVG",
 }
\ No newline at end of file
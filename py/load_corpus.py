@@ -0,0 +1,157 @@
+import os
+import glob
+from concurrent.futures import ThreadPoolExecutor
+from wordcloud_cache import LRUCache, hash_text, remember_text_digest
+from wordcloud_tokenize import TokenCounter, count_chunk, cached_counts, loaded_jieba_identity
+from wordcloud_engine import TextFrequencies
+
+# Every file read is kept by path with its mtime and size, the text or its word counts, so a run after
+# some files changed reads only those. The merged frequencies of the whole corpus are also kept on disk,
+# unless a file failed to read.
+
+CORPUS_CACHE_SIZE = 20000
+READ_THREADS = 8
+ENCODINGS = ('utf-8-sig', 'gb18030')
+corpus_cache = LRUCache('corpus file', CORPUS_CACHE_SIZE)
+
+def log(message):
+    print(f"# 😺dzNodes: Load Text Corpus -> {message}")
+
+class LoadTextCorpus:
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "path": ("STRING", {"default": ""}),  # 文件夹或通配符路径，如 d:\texts\*.txt
+                "pattern": ("STRING", {"default": "*.txt"}),  # path为文件夹时匹配的文件名
+                "recursive": ("BOOLEAN", {"default": True}),  # 包含子文件夹
+            },
+            "optional": {
+                "streaming": ("BOOLEAN", {"default": False}),  # 逐个文件统计词频并合并，只输出词频
+                "include_numbers": ("BOOLEAN", {"default": False}),  # 词频是否包含数字
+                "tokenizer": ("WORDCLOUD_TOKENIZER",),  # 统计词频时使用的自定义词典和停用词表
+            },
+        }
+
+    RETURN_TYPES = ("STRING", "WORD_FREQUENCIES",)
+    RETURN_NAMES = ("Text", "word_frequencies",)
+    FUNCTION = "load_corpus"
+    OUTPUT_NODE = True
+    CATEGORY = '😺dzNodes/WordCloud'
+
+    @classmethod
+    def IS_CHANGED(cls, path, pattern, recursive, **kwargs):
+        # a new, removed or edited file runs the node again
+        return repr(corpus_fingerprint(list_files(path, pattern, recursive)))
+
+    def load_corpus(self, path, pattern, recursive, streaming=False, include_numbers=False, tokenizer=None):
+        files = list_files(path, pattern, recursive)
+        if not files:
+            log(f"ERROR, no files found in {path}")
+        fingerprint = corpus_fingerprint(files)
+
+        if streaming:
+            # the counts of a file with Chinese were segmented by the jieba of this process, once it is loaded
+            # its dictionary is part of the key
+            identity = loaded_jieba_identity() if tokenizer is None else tokenizer.identity
+
+            def count():
+                counter = TokenCounter(include_numbers, resources=tokenizer)
+                values = read_files(files, lambda x: count_chunk(x, include_numbers, tokenizer),
+                                    (bool(include_numbers), identity))
+                # merged in file order, the same counts as the files joined into one text
+                for counts in values:
+                    if counts is not None:
+                        counter.merge(counts)
+                # without an unreadable file the counts are not those of the corpus, they are counted again next run
+                return counter.frequencies(), counter.han, None not in values
+
+            freq_dict = cached_counts(('corpus', fingerprint), include_numbers, tokenizer, count)
+            log(f"{len(files)} files, {len(freq_dict)} words. {corpus_cache!r}")
+            preview = corpus_preview(files, f"{len(freq_dict)} words")
+            return {"ui": {"text": preview}, "result": (preview, freq_dict,)}
+
+        values = read_files(files)
+        text = '\n'.join(x for x in values if x is not None)
+        # unchanged files keep their digest, ComfyWordCloud's frequency cache needs no hashing. Only the
+        # files read are in the key, the text without a failed file is not the text of the whole corpus
+        read = [x for x, value in zip(fingerprint, values) if value is not None]
+        remember_text_digest(text, hash_text(repr(('corpus', read))))
+        # the same frequency cache entry as Word Cloud tokenizing the Text output, counted on first use
+        freq_dict = TextFrequencies(text, include_numbers, tokenizer)
+        log(f"{len(files)} files, {len(text)} characters. {corpus_cache!r}")
+        return {"ui": {"text": corpus_preview(files, f"{len(text)} characters")}, "result": (text, freq_dict,)}
+
+def list_files(path, pattern='*.txt', recursive=True):
+    """Sorted files of a directory matching pattern, or of a glob."""
+    path = os.path.normpath(path.strip()) if path.strip() else ''
+    if not path:
+        return []
+    if os.path.isdir(path):
+        path = os.path.join(glob.escape(path), '**', pattern) if recursive else os.path.join(glob.escape(path), pattern)
+    return sorted({os.path.abspath(x) for x in glob.glob(path, recursive=recursive) if os.path.isfile(x)})
+
+def corpus_fingerprint(files):
+    fingerprint = []
+    for path in files:
+        try:
+            stat = os.stat(path)
+            fingerprint.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return fingerprint
+
+def read_text(path):
+    """Text of a file in the first of ENCODINGS it decodes with, else utf-8 with replacement characters."""
+    for encoding in ENCODINGS:
+        try:
+            with open(path, 'r', encoding=encoding) as f:
+                return f.read()
+        except UnicodeDecodeError:
+            continue
+    log(f"{path} is not {' or '.join(ENCODINGS)}, undecodable bytes replaced.")
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+def read_file(path, convert=None, settings=()):
+    # the cached value is used while the file keeps its mtime and size
+    key = (path,) + settings
+    try:
+        stat = os.stat(path)
+        fingerprint = (stat.st_mtime_ns, stat.st_size)
+        entry = corpus_cache.get(key)
+        if entry is not None and entry[0] == fingerprint:
+            return entry[1]
+        value = read_text(path)
+        if convert is not None:
+            value = convert(value)
+        corpus_cache.put(key, (fingerprint, value))
+        return value
+    except Exception as e:
+        log(f"ERROR, {path}, " + repr(e))
+        return None
+
+def read_files(files, convert=None, settings=()):
+    """read_file of every file on READ_THREADS threads, in file order, None for a file that failed."""
+    if len(files) > 1:
+        with ThreadPoolExecutor(max_workers=min(READ_THREADS, len(files))) as pool:
+            values = list(pool.map(lambda x: read_file(x, convert, settings), files))
+    else:
+        values = [read_file(x, convert, settings) for x in files]
+    return values
+
+def corpus_preview(files, summary):
+    names = '\n'.join(files[:20]) + ('\n...' if len(files) > 20 else '')
+    return f"{names}\n\n[{len(files)} files, {summary}]"
+
+
+NODE_CLASS_MAPPINGS = {
+    "LoadTextCorpus": LoadTextCorpus
+}
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "LoadTextCorpus": "Load Text Corpus"
+}
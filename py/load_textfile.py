@@ -1,4 +1,7 @@
 import os
+from wordcloud_cache import file_text_digest, file_fingerprint
+from wordcloud_tokenize import count_file, cached_counts, PREVIEW_SIZE
+from wordcloud_engine import TextFrequencies
 
 class LoadTextFile:
 
@@ -12,27 +15,61 @@ class LoadTextFile:
                 "path": ("STRING", {"default": 'c:\\text.txt'}),
             },
             "optional": {
+                "streaming": ("BOOLEAN", {"default": False}),  # 分段读取并统计词频，只输出词频，适合大文件
+                "include_numbers": ("BOOLEAN", {"default": False}),  # 词频是否包含数字
+                "tokenizer": ("WORDCLOUD_TOKENIZER",),  # 统计词频时使用的自定义词典和停用词表
             },
         }
 
 
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("Text",)
+    RETURN_TYPES = ("STRING", "WORD_FREQUENCIES",)
+    RETURN_NAMES = ("Text", "word_frequencies",)
     FUNCTION = "load_text_file"
     OUTPUT_NODE = True
     CATEGORY = '😺dzNodes/WordCloud'
 
-    def load_text_file(self, path):
+    def load_text_file(self, path, streaming=False, include_numbers=False, tokenizer=None):
+
+        if streaming:
+            return self.count_text_file(path, include_numbers, tokenizer)
 
         text_content = ""
         try:
             with open(os.path.normpath(path), 'r',  encoding="utf-8") as f:
-                text_content = ''.join(str(l) for l in f.read())
+                text_content = f.read()
+            # unchanged files keep their digest, ComfyWordCloud's frequency cache needs no hashing
+            file_text_digest(path, text_content)
             print("# 😺dzNodes: Load Text File -> " + path + " success.")
         except Exception as e:
             print("# 😺dzNodes: Load Text File -> ERROR, " + path + ", " + repr(e))
 
-        return {"ui": {"text":text_content}, "result": (text_content,)}
+        # counted when a node uses them, the same frequency cache entry as Word Cloud tokenizing the Text output
+        freq_dict = TextFrequencies(text_content, include_numbers, tokenizer)
+        return {"ui": {"text":text_content}, "result": (text_content, freq_dict,)}
+
+    def count_text_file(self, path, include_numbers, tokenizer=None):
+        # peak memory depends on the vocabulary, not on the file size
+        freq_dict = {}
+        preview = ""
+        try:
+            path = os.path.normpath(path)
+
+            def count():
+                freq_dict, preview, han = count_file(path, include_numbers, resources=tokenizer)
+                return {'frequencies': freq_dict, 'preview': preview}, han, True
+
+            # jieba is only loaded for a file with Chinese
+            cached = cached_counts(('file', os.path.abspath(path), *file_fingerprint(path)), include_numbers, tokenizer, count)
+            freq_dict = cached['frequencies']
+            preview = cached['preview']
+            print(f"# 😺dzNodes: Load Text File -> {path} success, {len(freq_dict)} words.")
+        except Exception as e:
+            print("# 😺dzNodes: Load Text File -> ERROR, " + path + ", " + repr(e))
+
+        if len(preview) >= PREVIEW_SIZE:
+            preview += '...'
+        preview += f"\n\n[{len(freq_dict)} words]"
+        return {"ui": {"text": preview}, "result": (preview, freq_dict,)}
 
 
 NODE_CLASS_MAPPINGS = {
@@ -40,4 +77,4 @@ NODE_CLASS_MAPPINGS = {
 }
 NODE_DISPLAY_NAME_MAPPINGS = {
     "LoadTextFile": "Load Text File"
-}
\ No newline at end of file
+}
@@ -0,0 +1,57 @@
+import os
+from wordcloud_tokenize import load_tokenizer_resources, file_identity, tokenizer_cache
+
+class LoadTokenizer:
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "user_dict": ("STRING", {"default": ""}),  # jieba自定义词典路径，每行：词语 [词频] [词性]
+                "stopword_files": ("STRING", {"default": "", "multiline": True}),  # 停用词表路径，每行一个文件，文件中每行一个词
+            },
+            "optional": {
+                "replace_dictionary": ("BOOLEAN", {"default": False}),  # 只用自定义词典，不加载jieba默认词典，每行须有词频
+            },
+        }
+
+    RETURN_TYPES = ("WORDCLOUD_TOKENIZER",)
+    RETURN_NAMES = ("tokenizer",)
+    FUNCTION = "load_tokenizer"
+    CATEGORY = '😺dzNodes/WordCloud'
+
+    @classmethod
+    def IS_CHANGED(cls, user_dict, stopword_files, replace_dictionary=False):
+        # edited files are loaded again, unchanged ones come from the tokenizer cache
+        paths = [user_dict] + split_paths(stopword_files)
+        return repr([file_identity(os.path.normpath(x)) for x in paths if x])
+
+    def load_tokenizer(self, user_dict, stopword_files, replace_dictionary=False):
+        user_dict = os.path.normpath(user_dict) if user_dict.strip() else ''
+        if user_dict and not os.path.isfile(user_dict):
+            print("# 😺dzNodes: Load Tokenizer -> ERROR, " + user_dict + " not found, jieba's dictionary is used.")
+            user_dict = ''
+        paths = []
+        for path in split_paths(stopword_files):
+            path = os.path.normpath(path)
+            if os.path.isfile(path):
+                paths.append(path)
+            else:
+                print("# 😺dzNodes: Load Tokenizer -> ERROR, " + path + " not found.")
+        resources = load_tokenizer_resources(user_dict, paths, replace_dictionary)
+        print(f"# 😺dzNodes: Load Tokenizer -> {resources!r}, {tokenizer_cache!r}")
+        return (resources,)
+
+def split_paths(paths):
+    return [x.strip() for x in paths.splitlines() if x.strip()]
+
+
+NODE_CLASS_MAPPINGS = {
+    "LoadTokenizer": LoadTokenizer
+}
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "LoadTokenizer": "Load Tokenizer"
+}
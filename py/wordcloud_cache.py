@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Word frequencies of tokenized texts, kept on disk under the plugin directory so they survive restarts.
+# Every entry is one json file named by its key, the file mtime is its last use, oldest files are evicted first.
+
+cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.normpath(__file__))), 'cache')
+frequency_cache_dir = os.path.join(cache_dir, 'frequencies')
+file_index_path = os.path.join(cache_dir, 'file_index.json')
+FREQUENCY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+FREQUENCY_CACHE_VERSION = 2
+
+def log(message):
+    name = 'WordCloud'
+    print(f"# 😺dzNodes: {name} ->  {message}")
+
+_lock = threading.Lock()
+_memory_cache = OrderedDict()  # the last few entries, saves parsing the json again
+_MEMORY_CACHE_SIZE = 8
+_known_digests = OrderedDict()  # id(text) -> (text, digest) of texts loaded by LoadTextFile
+_KNOWN_DIGESTS_SIZE = 8
+
+def hash_text(text):
+    return hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+def remember_text_digest(text, digest):
+    # the entry keeps the string alive, so its id can't be reused by another text
+    with _lock:
+        _known_digests[id(text)] = (text, digest)
+        _known_digests.move_to_end(id(text))
+        while len(_known_digests) > _KNOWN_DIGESTS_SIZE:
+            _known_digests.popitem(last=False)
+
+def text_digest(text):
+    entry = _known_digests.get(id(text))
+    if entry is not None and entry[0] is text:
+        return entry[1]
+    return hash_text(text)
+
+def _load_file_index():
+    try:
+        with open(file_index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _prune_file_index(index):
+    # the entries of files that were removed or changed since, their digests can't be used again
+    for path, entry in list(index.items()):
+        try:
+            if file_fingerprint(path) != entry[:2]:
+                del index[path]
+        except OSError:
+            del index[path]
+
+def _write_json(path, data):
+    # write to a temporary file first, so other ComfyUI instances never read a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def file_text_digest(path, text):
+    """Digest of the text read from path, only hashed again when the file mtime or size changed."""
+    path = os.path.normcase(os.path.abspath(path))
+    fingerprint = file_fingerprint(path)
+    with _lock:
+        index = _load_file_index()
+        entry = index.get(path)
+        if entry is not None and entry[:2] == fingerprint:
+            # nothing changed, the index is not written
+            digest = entry[2]
+        else:
+            digest = hash_text(text)
+            _prune_file_index(index)
+            index[path] = fingerprint + [digest]
+            try:
+                _write_json(file_index_path, index)
+            except OSError as e:
+                log(f'ERROR: {file_index_path} ' + repr(e))
+    remember_text_digest(text, digest)
+    return digest
+
+def frequency_key(digest, *settings):
+    return hashlib.sha1(repr((FREQUENCY_CACHE_VERSION, digest) + settings).encode('utf-8')).hexdigest()
+
+def get_frequencies(key):
+    """Cached word frequencies, a copy the caller may modify, or None."""
+    with _lock:
+        freq_dict = _memory_cache.get(key)
+        if freq_dict is not None:
+            _memory_cache.move_to_end(key)
+            return dict(freq_dict)
+    path = os.path.join(frequency_cache_dir, f'{key}.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            freq_dict = json.load(f)
+        os.utime(path)  # mark as recently used
+    except (OSError, ValueError):
+        return None
+    _remember(key, freq_dict)
+    return dict(freq_dict)
+
+def put_frequencies(key, freq_dict):
+    _remember(key, dict(freq_dict))
+    path = os.path.join(frequency_cache_dir, f'{key}.json')
+    try:
+        _write_json(path, freq_dict)
+        evict_frequencies()
+    except OSError as e:
+        log(f'ERROR: frequency cache ' + repr(e))
+
+def _remember(key, freq_dict):
+    with _lock:
+        _memory_cache[key] = freq_dict
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > _MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+def evict_frequencies(max_bytes=None):
+    # least recently used entries go first, until the cache fits in max_bytes
+    if max_bytes is None:
+        max_bytes = FREQUENCY_CACHE_MAX_BYTES
+    entries = []
+    with os.scandir(frequency_cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    total = sum(x[1] for x in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+class LRUCache:
+    """Bounded in-memory cache, least recently used entries are evicted first.
+
+    hits, misses and evictions are counted for the log.
+    """
+    def __init__(self, name, max_size):
+        self.name = name
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self._data)}
+
+    def __repr__(self):
+        return f'{self.name} cache (' + ', '.join(f'{k}={v}' for k, v in self.stats().items()) + ')'
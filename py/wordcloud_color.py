@@ -0,0 +1,68 @@
+import numpy as np
+from PIL import Image
+from wordcloud_cache import LRUCache
+from wordcloud_fonts import text_bbox
+from wordcloud_imagefunc import tensor2rgb_list
+from wordcloud_mask import tensor_digest
+
+# Word colors from color_ref_image, the mean color of the reference under every word like wordcloud's
+# ImageColorGenerator, read from one summed-area table instead of averaging a slice per word.
+# The converted references and their tables are kept by a digest of the tensor.
+
+REFERENCE_CACHE_SIZE = 8
+TABLE_CACHE_SIZE = 8
+reference_cache = LRUCache('color reference', REFERENCE_CACHE_SIZE)
+table_cache = LRUCache('color table', TABLE_CACHE_SIZE)
+
+def prepare_references(color_ref_image):
+    """(keys, RGB uint8 arrays) of the batch items of a color_ref_image tensor, ([None], [None]) without image."""
+    if color_ref_image is None:
+        return [None], [None]
+    digest = tensor_digest(color_ref_image)
+    references = reference_cache.get(digest)
+    if references is None:
+        references = tensor2rgb_list(color_ref_image)
+        reference_cache.put(digest, references)
+    return [f'{digest}:{i}' for i in range(len(references))], references
+
+def reference_table(color_ref, size, key=None):
+    """Summed-area table, (height + 1, width + 1, 3), of color_ref resized to size (width, height)."""
+    cache_key = None if key is None else (key, size)
+    table = table_cache.get(cache_key) if cache_key is not None else None
+    if table is None:
+        image = np.asarray(Image.fromarray(color_ref).resize(size))[:, :, :3]
+        # uint32 wraps around, box sums stay exact as long as the whole image sums below 2 ** 32
+        dtype = np.uint32 if image.shape[0] * image.shape[1] * 255 < 2 ** 32 else np.uint64
+        table = np.zeros((image.shape[0] + 1, image.shape[1] + 1, 3), dtype=dtype)
+        np.cumsum(np.cumsum(image, axis=0, dtype=dtype), axis=1, dtype=dtype, out=table[1:, 1:])
+        if cache_key is not None:
+            table_cache.put(cache_key, table)
+    return table
+
+def reference_colors(layout, table, font_path):
+    """'rgb(r, g, b)' colors of the words of a layout, as ImageColorGenerator returns them."""
+    if not layout:
+        return []
+    height, width = table.shape[0] - 1, table.shape[1] - 1
+    boxes = np.array([text_bbox(font_path, font_size, orientation, word, anchor=None)[2:]
+                      for (word, _), font_size, _, orientation, _ in layout])
+    positions = np.array([position for _, _, position, _, _ in layout])
+    # ImageColorGenerator cuts image[x:x + box[2], y:y + box[3]], the same patch is averaged here
+    top = np.minimum(positions[:, 0], height)
+    left = np.minimum(positions[:, 1], width)
+    bottom = np.clip(positions[:, 0] + boxes[:, 0], top, height)
+    right = np.clip(positions[:, 1] + boxes[:, 1], left, width)
+    count = (bottom - top) * (right - left)
+    if not count.all():
+        raise ValueError('ImageColorGenerator is smaller than the canvas')
+    sums = table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left]
+    colors = sums / count[:, np.newaxis]
+    return ["rgb(%d, %d, %d)" % tuple(color) for color in colors]
+
+def recolor_from_reference(wc, color_ref, key=None):
+    """wc.recolor(color_func=ImageColorGenerator(color_ref resized to the canvas)), returns wc."""
+    table = reference_table(color_ref, (wc.width, wc.height), key)
+    colors = reference_colors(wc.layout_, table, wc.font_path)
+    wc.layout_ = [(word_freq, font_size, position, orientation, color)
+                  for (word_freq, font_size, position, orientation, _), color in zip(wc.layout_, colors)]
+    return wc
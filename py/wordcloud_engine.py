@@ -0,0 +1,396 @@
+import os
+import re
+import sys
+import types
+import hashlib
+import time
+import random
+import functools
+import contextlib
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import wordcloud_cache
+import wordcloud_layout
+import wordcloud_mask
+import wordcloud_color
+from wordcloud_stats import Timings, null_timings
+from wordcloud_tokenize import text_identity, count_text
+
+# This module must stay free of torch and ComfyUI imports: it is imported by the worker processes.
+# wordcloud (which loads matplotlib) and jieba are imported on first use, to keep ComfyUI start-up fast.
+
+def log(message):
+    name = 'WordCloud'
+    print(f"# 😺dzNodes: {name} ->  {message}")
+
+def split_words(words):
+    # 用中英文逗号或空格分开
+    return [x for x in re.split(r'[，,\s*]', words) if x != '']  # 去除空字符
+
+@functools.lru_cache(maxsize=64)
+def word_list(words):
+    # the stopwords and keynote_words inputs rarely change between executions, split them once
+    return tuple(split_words(words))
+
+PARALLEL_TOKENIZE_MIN_CHARS = 1024 * 1024
+
+def tokenize(text, include_numbers=False, resources=None):
+    # large texts are segmented on all cores, the merged result is the same
+    workers = worker_count()
+    if len(text) >= PARALLEL_TOKENIZE_MIN_CHARS and workers > 1:
+        try:
+            return count_text(text, include_numbers, get_process_pool(), workers * 4, resources)
+        except BrokenProcessPool as e:
+            reset_process_pool(e)
+    # only the Chinese parts go through jieba, the stopwords of the resources are dropped while counting
+    return count_text(text, include_numbers, resources=resources)
+
+def cached_tokenize(text, include_numbers=False, timings=null_timings, resources=None):
+    with timings.stage('tokenize'):
+        identity = text_identity(text, resources)
+        key = wordcloud_cache.frequency_key(wordcloud_cache.text_digest(text), bool(include_numbers), identity)
+        freq_dict = wordcloud_cache.get_frequencies(key)
+        if freq_dict is not None:
+            timings.count('frequency_cache_hits')
+            log(f"word frequencies loaded from cache.")
+            return freq_dict
+        timings.count('frequency_cache_misses')
+        freq_dict = tokenize(text, include_numbers, resources)
+        wordcloud_cache.put_frequencies(key, freq_dict)
+        return freq_dict
+
+class TextFrequencies:
+    """WORD_FREQUENCIES of a text, counted on first use. A loader can output them without tokenizing
+    texts that are only passed on as text."""
+    def __init__(self, text, include_numbers=False, resources=None):
+        self.text = text
+        self.include_numbers = include_numbers
+        self.resources = resources
+        self._frequencies = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._frequencies is None:
+                self._frequencies = cached_tokenize(self.text, self.include_numbers, resources=self.resources)
+        return self._frequencies
+
+def resolve_frequencies(word_frequencies):
+    """A WORD_FREQUENCIES value as a dict, or a list of them, TextFrequencies counted."""
+    if isinstance(word_frequencies, TextFrequencies):
+        return word_frequencies.get()
+    if isinstance(word_frequencies, (list, tuple)):
+        return [resolve_frequencies(x) for x in word_frequencies]
+    return word_frequencies
+
+def text_to_frequencies(text, include_numbers=False, stopwords='', keynote_words='', keynote_weight=60,
+                        timings=null_timings, resources=None):
+    return apply_word_settings(cached_tokenize(text, include_numbers, timings, resources),
+                               stopwords, keynote_words, keynote_weight, timings)
+
+def apply_word_settings(freq_dict, stopwords='', keynote_words='', keynote_weight=60, timings=null_timings,
+                        resources=None):
+    """Add keynote_words and remove stopwords, modifies freq_dict.
+
+    resources removes its stopwords too, for frequencies that were not counted with it.
+    """
+    with timings.stage('word_settings'):
+        if resources is not None:
+            for word in [x for x in freq_dict if x.lower() in resources.stopwords]:
+                del freq_dict[word]
+        _apply_word_settings(freq_dict, stopwords, keynote_words, keynote_weight)
+    timings.count('words', len(freq_dict))
+    log(f"word frequencies dict generated, include {len(freq_dict)} words.")
+    return freq_dict
+
+def _apply_word_settings(freq_dict, stopwords, keynote_words, keynote_weight):
+    if keynote_words:
+        keynote_freq = keynote_weight + max(freq_dict.values())
+        freq_dict.update({x: keynote_freq for x in word_list(keynote_words)})
+
+    if stopwords:
+        # 同时在词典中删除（stopwords之bug）
+        for item in set(word_list(stopwords)):
+            if item in freq_dict.keys():
+                del freq_dict[item]
+
+# WordCloud arguments that change where words are placed, the others only change how they are drawn
+LAYOUT_ARGS = ('width', 'height', 'font_path', 'min_font_size', 'max_font_size', 'relative_scaling',
+               'prefer_horizontal', 'margin', 'max_words', 'repeat', 'random_state')
+LAYOUT_CACHE_SIZE = 64
+layout_cache = wordcloud_cache.LRUCache('layout', LAYOUT_CACHE_SIZE)
+
+def layout_key(frequencies, wc_args, mask=None, layout_engine='wordcloud', mask_key=None, previous_key=None):
+    """Key of a layout in layout_cache, None if random_state is not fixed.
+
+    mask_key from wordcloud_mask.prepare_masks saves hashing the mask again. previous_key is the key of the
+    frame before in a sequence, the layout depends on it.
+    """
+    if wc_args.get('random_state') is None:
+        return None
+    if previous_key is not None:
+        return hashlib.sha1((previous_key + layout_key(frequencies, wc_args, mask, layout_engine, mask_key)).encode('utf-8')).hexdigest()
+    h = hashlib.sha1(repr(tuple(frequencies.items())).encode('utf-8'))
+    h.update(repr(tuple(wc_args.get(x) for x in LAYOUT_ARGS) + (layout_engine,)).encode('utf-8'))
+    if mask_key is not None:
+        h.update(mask_key.encode('utf-8'))
+    elif mask is not None:
+        h.update(repr(mask.shape).encode('utf-8'))
+        h.update(np.ascontiguousarray(mask).data)
+    return h.hexdigest()
+
+def render_wordcloud(frequencies, wc_args, mask=None, color_ref=None, layout=None, layout_engine='wordcloud',
+                     time_budget=0, progress=None, timings=null_timings, mask_key=None, color_ref_key=None,
+                     previous_layout=None, draw=True, color_seed=None):
+    """Lay out and render one word cloud, return it as a RGBA uint8 array, its layout and whether that is complete.
+
+    mask is a uint8 array, white (255) is masked out, color_ref a RGB uint8 array of any size.
+    mask_key from wordcloud_mask.prepare_masks keeps the contour of the mask for the next call,
+    color_ref_key from wordcloud_color.prepare_references the resized reference.
+    A given layout, from the layout cache or the Word Cloud Layout node, skips the placement, with
+    previous_layout only the words that changed since are placed. A layout cut short by time_budget
+    must not be cached. Without draw only the layout is made, the image is None. color_seed colors
+    every word from its own seed, the frames of a sequence keep the colors of their words.
+    """
+    from wordcloud import WordCloud
+    wc = WordCloud(mask=mask, **wc_args)
+    complete = True
+    if layout is None:
+        start = time.monotonic()
+        with timings.stage('placement'):
+            if previous_layout is not None:
+                wordcloud_layout.update_layout(wc, frequencies, previous_layout, engine=layout_engine,
+                                               progress=progress, time_budget=time_budget)
+            else:
+                wordcloud_layout.generate_from_frequencies(wc, frequencies, engine=layout_engine,
+                                                           progress=progress, time_budget=time_budget)
+        complete = not time_budget or time.monotonic() - start <= time_budget
+    else:
+        wc.layout_ = layout
+    if not draw:
+        return None, wc.layout_, complete
+
+    with timings.stage('recolor'):
+        _recolor(wc, wc_args.get('random_state'), color_ref, color_ref_key, color_seed)
+
+    with timings.stage('draw'):
+        image = np.asarray(wordcloud_layout.to_image(wc, contour=False).convert('RGBA'))
+    with timings.stage('contour'):
+        image = wordcloud_mask.draw_contour(image, mask, wc.contour_width, wc.contour_color, mask_key)
+    timings.count('canvas_pixels', image.shape[0] * image.shape[1])
+    return image, wc.layout_, complete
+
+def _recolor(wc, random_state=None, color_ref=None, color_ref_key=None, color_seed=None):
+    if color_ref is not None:
+        wordcloud_color.recolor_from_reference(wc, color_ref, color_ref_key)
+    elif color_seed is not None:
+        # a str seed is hashed with sha512, the same color in every process
+        wc.layout_ = [(word_freq, font_size, position, orientation,
+                       wc.color_func(word=word_freq[0], font_size=font_size, position=position, orientation=orientation,
+                                     random_state=random.Random(f'{color_seed}:{word_freq[0]}'), font_path=wc.font_path))
+                      for word_freq, font_size, position, orientation, _ in wc.layout_]
+    else:
+        # colors are drawn again from the seed, a given layout renders the same as a new one
+        wc.recolor(random_state=random_state)
+
+def styled_wordcloud(wc_args, layout, mask=None, color_ref=None, color_ref_key=None, timings=null_timings,
+                     color_seed=None):
+    """A WordCloud with a placed layout and its colors, for drawing without placing the words again."""
+    from wordcloud import WordCloud
+    wc = WordCloud(mask=mask, **wc_args)
+    wc.layout_ = layout
+    with timings.stage('recolor'):
+        _recolor(wc, wc_args.get('random_state'), color_ref, color_ref_key, color_seed)
+    return wc
+
+# pixels of one band of render_tiled, 16MB as RGBA
+TILE_PIXELS = 4 * 1024 * 1024
+
+def canvas_size(wc_args, mask=None):
+    """(height, width) of the rendered image."""
+    height, width = mask.shape[:2] if mask is not None else (wc_args['height'], wc_args['width'])
+    scale = wc_args.get('scale', 1)
+    return int(height * scale), int(width * scale)
+
+def render_tiled(image_out, mask_out, wc_args, layout, mask=None, color_ref=None, mask_key=None,
+                 color_ref_key=None, timings=null_timings, color_seed=None, **unused):
+    """Render a layout into float32 arrays, image_out (height, width, 4) and mask_out (height, width).
+
+    The same values as render_wordcloud followed by rgba2tensor, drawn in bands of TILE_PIXELS, so
+    besides the outputs only one band is held, and the contour pixels of a mask.
+    """
+    wc = styled_wordcloud(wc_args, layout, mask, color_ref, color_ref_key, timings, color_seed)
+    height, width = image_out.shape[:2]
+    pixels = None
+    if mask is not None and wc.contour_width != 0:
+        with timings.stage('contour'):
+            pixels = wordcloud_mask.contour_layer(mask, (width, height), wc.contour_width, mask_key)
+            color = wordcloud_mask.contour_rgba(wc.contour_color)
+    rows = max(1, TILE_PIXELS // width)
+    for top in range(0, height, rows):
+        bottom = min(height, top + rows)
+        with timings.stage('draw'):
+            band = np.array(wordcloud_layout.draw_band(wc, top, bottom).convert('RGBA'))
+        if pixels is not None:
+            with timings.stage('contour'):
+                # the contour pixels are sorted flat indices
+                start, end = np.searchsorted(pixels, (top * width, bottom * width))
+                band.reshape(-1, 4)[pixels[start:end] - top * width] = color
+        with timings.stage('tensor'):
+            np.divide(band, np.float32(255.), out=image_out[top:bottom], dtype=np.float32)
+            np.divide(band[..., 3], np.float32(255.), out=mask_out[top:bottom], dtype=np.float32)
+    timings.count('canvas_pixels', height * width)
+
+def render_batch_tiled(jobs, progress=None, timings=null_timings):
+    """Render a list of render_wordcloud() keyword dicts with a layout, one after the other with render_tiled.
+
+    Returns float32 arrays, (batch, height, width, 4) and (batch, height, width), allocated once.
+    """
+    height, width = canvas_size(jobs[0]['wc_args'], jobs[0]['mask'])
+    if any(canvas_size(job['wc_args'], job['mask']) != (height, width) for job in jobs):
+        raise ValueError('the images of a batch must have the same size')
+    image = np.empty((len(jobs), height, width, 4), dtype=np.float32)
+    mask = np.empty((len(jobs), height, width), dtype=np.float32)
+    for i, job in enumerate(jobs):
+        if progress is not None:
+            progress.images_done(i)
+        render_tiled(image[i], mask[i], timings=timings, **job)
+    return image, mask
+
+def warm_up():
+    """Import wordcloud and load jieba's dictionary in a background thread, before the first execution needs them."""
+    def load():
+        import jieba
+        import wordcloud
+        jieba.initialize()
+        log('jieba dictionary loaded.')
+    thread = threading.Thread(target=load, name='wordcloud warm up', daemon=True)
+    thread.start()
+    return thread
+
+class PlacementCancelled(Exception):
+    pass
+
+# set by the main process to stop the placement in the worker processes, ComfyUI's interrupt flag is not shared
+_cancel_event = None
+
+def _init_worker(cancel_event):
+    global _cancel_event
+    _cancel_event = cancel_event
+
+def _check_cancelled(placed, total, font_size):
+    if _cancel_event is not None and _cancel_event.is_set():
+        raise PlacementCancelled()
+
+def _render_job(job, collect_timings=False):
+    timings = Timings(collect_timings)
+    return render_wordcloud(progress=_check_cancelled, timings=timings, **job) + (timings,)
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+# processes for one execution, None for all CPUs. Callers running many executions side by side, like
+# wordcloud_batch.py, set 1 so every execution stays in its own process.
+max_workers = None
+
+def worker_count():
+    if not hasattr(ProcessPoolExecutor, '_spawn_process'):
+        # the workers can't be started without the __main__ of the host, everything runs in this process
+        return 1
+    cpus = available_cpus()
+    return cpus if max_workers is None else max(1, min(max_workers, cpus))
+
+@contextlib.contextmanager
+def _bare_main():
+    # a spawned process imports the __main__ of its parent as __mp_main__, in ComfyUI that is main.py with
+    # torch and every custom node. Without __file__ and __spec__ nothing is imported.
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+class _WorkerPool(ProcessPoolExecutor):
+    """ProcessPoolExecutor whose workers only import the modules of the jobs, not the host's __main__."""
+    def _spawn_process(self):
+        with _bare_main():
+            super()._spawn_process()
+
+_process_pool = None
+
+def get_process_pool():
+    # shared by every execution, so worker start-up (and jieba's dictionary load) is paid once.
+    # Spawned, forking the threads and the CUDA state of ComfyUI is not safe.
+    global _process_pool, _cancel_event
+    if _process_pool is None:
+        context = multiprocessing.get_context('spawn')
+        _cancel_event = context.Event()
+        _process_pool = _WorkerPool(max_workers=worker_count(), mp_context=context,
+                                    initializer=_init_worker, initargs=(_cancel_event,))
+    return _process_pool
+
+def reset_process_pool(e):
+    global _process_pool
+    log(f'process pool failed, continue in this process. ' + repr(e))
+    if _process_pool is not None:
+        # the workers still alive are stopped, the next get_process_pool starts new ones
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+    _process_pool = None
+
+def render_batch(jobs, progress=None, timings=null_timings):
+    """Render a list of render_wordcloud() keyword dicts, in parallel when there is more than one.
+
+    progress is a wordcloud_progress.NodeProgress, it reports the placed words when the images are
+    rendered in this process and the finished images when they are rendered by the pool.
+    """
+    if len(jobs) > 1 and worker_count() > 1:
+        try:
+            return _render_parallel(jobs, progress, timings)
+        except BrokenProcessPool as e:
+            reset_process_pool(e)
+    results = []
+    for i, job in enumerate(jobs):
+        results.append(render_wordcloud(progress=progress.placement(i) if progress else None, timings=timings, **job))
+    return results
+
+def render_sequence(jobs, progress=None, timings=null_timings):
+    """Render the jobs as the frames of one sequence, every frame keeps the words of the frame before in place.
+
+    The frames depend on each other, they are rendered one after the other in this process.
+    """
+    results = []
+    previous_layout = None
+    for i, job in enumerate(jobs):
+        results.append(render_wordcloud(progress=progress.placement(i) if progress else None, timings=timings,
+                                        previous_layout=previous_layout, **job))
+        previous_layout = results[-1][1]
+    return results
+
+def _render_parallel(jobs, progress, timings):
+    futures = [get_process_pool().submit(_render_job, job, timings.enabled) for job in jobs]
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if progress is not None:
+                progress.images_done(len(futures) - len(pending))
+    except BaseException:
+        # interrupted: stop the workers between two words, so the pool is free for the next prompt
+        for future in futures:
+            future.cancel()
+        _cancel_event.set()
+        wait(futures)
+        _cancel_event.clear()
+        raise
+    results = []
+    for future in futures:
+        image, layout, complete, job_timings = future.result()
+        timings.merge(job_timings)
+        results.append((image, layout, complete))
+    return results
@@ -0,0 +1,99 @@
+import os
+import glob
+import threading
+import functools
+
+# Font discovery, deferred to the first use and repeated only when font_dir.ini or the font directory changes.
+
+plugin_dir = os.path.dirname(os.path.dirname(os.path.normpath(__file__)))
+default_font_dir = os.path.join(plugin_dir, 'font')
+default_font = os.path.join(default_font_dir, 'Alibaba-PuHuiTi-Heavy.ttf')
+ini_file = os.path.join(plugin_dir, "font_dir.ini")
+
+def log(message):
+    name = 'WordCloud'
+    print(f"# 😺dzNodes: {name} ->  {message}")
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+_lock = threading.Lock()
+_UNREAD = object()
+_ini_stamp = _UNREAD  # mtime of font_dir.ini when read, None when it is missing
+_font_dir = default_font_dir
+_dir_stamp = None
+_font_dict = {}
+
+def get_font_dir():
+    global _ini_stamp, _font_dir
+    stamp = _mtime(ini_file)
+    if stamp == _ini_stamp:
+        return _font_dir
+    _ini_stamp = stamp
+    _font_dir = default_font_dir
+    try:
+        with open(ini_file, 'r') as f:
+            ini = f.read()
+            d = ini[ini.find('=') + 1:].rstrip().lstrip()
+            if os.path.exists(d):
+                _font_dir = d
+            else:
+                log(f'ERROR: invalid dir, default to be used. check {ini_file}')
+    except Exception as e:
+        log(f'ERROR: {ini_file} ' + repr(e))
+    return _font_dir
+
+def get_font_dict():
+    """{file name: path} of the *.ttf and *.otf files in the font directory."""
+    global _dir_stamp, _font_dict
+    with _lock:
+        font_dir = get_font_dir()
+        stamp = (font_dir, _mtime(font_dir))
+        if stamp != _dir_stamp:
+            file_list = glob.glob(font_dir + '/*.ttf')
+            file_list.extend(glob.glob(font_dir + '/*.otf'))
+            _font_dict = {os.path.split(x)[1]: x for x in file_list}
+            _dir_stamp = stamp
+            log(f'find {len(_font_dict)} fonts in {font_dir}')
+        return _font_dict
+
+def get_font_list():
+    return list(get_font_dict().keys())
+
+def get_font_path(font_name):
+    font_path = get_font_dict().get(font_name)
+    if font_path is None or not os.path.exists(font_path):
+        log(f"font_path not found, use {default_font}")
+        return default_font
+    log(f"font_path = {font_path}")
+    return font_path
+
+# Loaded FreeType faces and text sizes are kept for the whole process, so repeated runs with the
+# same font and words skip the font file parsing and the measuring.
+FONT_CACHE_SIZE = 512
+TEXT_BBOX_CACHE_SIZE = 200000
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_font(font_path, font_size, orientation=None):
+    # always transposed like in wordcloud, PIL draws a TransposedFont slightly differently even without rotation
+    from PIL import ImageFont
+    return ImageFont.TransposedFont(_get_face(font_path, font_size), orientation=orientation)
+
+@functools.lru_cache(maxsize=FONT_CACHE_SIZE)
+def _get_face(font_path, font_size):
+    from PIL import ImageFont
+    return ImageFont.truetype(font_path, font_size)
+
+_measure_draw = None
+
+@functools.lru_cache(maxsize=TEXT_BBOX_CACHE_SIZE)
+def text_bbox(font_path, font_size, orientation, word, anchor="lt"):
+    """Box of word drawn at (0, 0), as ImageDraw.textbbox returns it."""
+    global _measure_draw
+    if _measure_draw is None:
+        from PIL import Image, ImageDraw
+        _measure_draw = ImageDraw.Draw(Image.new("L", (1, 1)))
+    return _measure_draw.textbbox((0, 0), word, font=get_font(font_path, font_size, orientation), anchor=anchor)
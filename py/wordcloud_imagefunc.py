@@ -0,0 +1,68 @@
+import numpy as np
+from PIL import Image
+
+# Conversions between ComfyUI tensors, uint8 arrays and PIL images. torch is imported on first use.
+# IMAGE is a float32 (batch, height, width, channels) tensor, MASK a float32 (batch, height, width) tensor.
+
+def tensor2np(image):
+    # IMAGE/MASK tensor to uint8 array, batch dimension kept
+    import torch
+    return torch.clamp(image.detach() * 255., 0, 255).to(torch.uint8).cpu().numpy()
+
+def np2tensor(array):
+    # uint8 array to float tensor, one allocation
+    import torch
+    return torch.from_numpy(np.divide(array, np.float32(255.), dtype=np.float32))
+
+def float2tensor(array):
+    # float32 array already in 0..1 to tensor, no copy
+    import torch
+    return torch.from_numpy(array)
+
+# Tensor to PIL
+def tensor2pil(image):
+    return Image.fromarray(tensor2np(image).squeeze())
+
+# PIL to Tensor
+def pil2tensor(image):
+    return np2tensor(np.asarray(image)).unsqueeze(0)
+
+def getRGBAmask(image):
+    return np2tensor(np.asarray(image)[:, :, 3]).unsqueeze(0)
+
+def np_whitebackground(array):
+    """Flatten uint8 (..., height, width, channels) images onto white, return RGB."""
+    if array.ndim == 3 and array.shape[-1] not in (1, 3, 4):
+        array = array[..., np.newaxis]  # batch of grey images
+    if array.shape[-1] == 1:
+        return np.repeat(array, 3, axis=-1)
+    if array.shape[-1] == 3:
+        return array
+    alpha = array[..., 3:].astype(np.uint16)
+    rgb = array[..., :3] * alpha + 255 * (255 - alpha) + 127
+    return (rgb // 255).astype(np.uint8)
+
+def img_whitebackground(image):
+    return Image.fromarray(np_whitebackground(np.asarray(image.convert('RGBA'))))
+
+def tensor2rgb_list(image):
+    # one RGB uint8 array per batch item, [None] if no image input
+    if image is None:
+        return [None]
+    array = tensor2np(image)
+    if array.ndim == 3:
+        array = array[..., np.newaxis]
+    if array.shape[-1] == 1:
+        array = np.repeat(array, 3, axis=-1)
+    return list(array[..., :3])
+
+def rgba2tensor(images):
+    """Stack RGBA uint8 arrays into IMAGE and MASK tensors.
+
+    Both tensors are converted straight from the one uint8 buffer, the mask from a view of its alpha plane.
+    """
+    if len(images) == 1:
+        array = np.asarray(images[0])[np.newaxis]
+    else:
+        array = np.stack(images)
+    return np2tensor(array), np2tensor(array[..., 3])
@@ -0,0 +1,475 @@
+import time
+from random import Random
+from operator import itemgetter
+import numpy as np
+from PIL import Image, ImageDraw
+from wordcloud_fonts import get_font, text_bbox
+
+# WordCloud.generate_from_frequencies and WordCloud.to_image, taking fonts and text sizes from the
+# process-wide registry in wordcloud_fonts instead of opening the font file for every size tried.
+# They take the WordCloud as first argument, so wordcloud is not imported before it is needed.
+
+# wordcloud: the stock placement, same result as WordCloud.generate_from_frequencies
+# numpy: VectorOccupancyMap, a different but equally dense layout, faster for many words on big canvases
+LAYOUT_ENGINES = ['wordcloud', 'numpy']
+
+class VectorOccupancyMap(object):
+    """Occupancy of the canvas as a summed-area table, queried for all positions of a box at once.
+
+    The font size search is a bisection instead of one step at a time, and drawing a word only
+    updates the table by the pixels it changed instead of summing the canvas again.
+    """
+    def __init__(self, height, width, mask):
+        self.height = height
+        self.width = width
+        if mask is not None:
+            self.integral = np.cumsum(np.cumsum(255 * mask, axis=1),
+                                      axis=0).astype(np.uint32)
+        else:
+            self.integral = np.zeros((height, width), dtype=np.uint32)
+        # reused by every query, allocating canvas sized arrays costs more than the arithmetic
+        self._area = np.empty(height * width, dtype=np.uint32)
+        self._free = np.empty(height * width, dtype=bool)
+
+    def free_positions(self, size_x, size_y):
+        """Boolean (height - size_x, width - size_y) map of the positions where the box is empty, None if there is none."""
+        rows = self.height - size_x
+        cols = self.width - size_y
+        if rows <= 0 or cols <= 0:
+            return None
+        integral = self.integral
+        area = self._area[:rows * cols].reshape(rows, cols)
+        # uint32 wraps around, the area of an empty box is still exactly 0
+        np.subtract(integral[size_x:, size_y:], integral[size_x:, :cols], out=area)
+        np.subtract(area, integral[:rows, size_y:], out=area)
+        np.add(area, integral[:rows, :cols], out=area)
+        free = np.equal(area, 0, out=self._free[:rows * cols].reshape(rows, cols))
+        return free if free.any() else None
+
+    def _fit(self, wc, word, font_size, orientation):
+        box_size = text_bbox(wc.font_path, font_size, orientation, word)
+        return self.free_positions(box_size[3] + wc.margin, box_size[2] + wc.margin)
+
+    def find_position(self, wc, word, font_size, orientation, random_state):
+        """Largest font size not above font_size with room for word, returns (position, font_size, orientation)."""
+        other = Image.ROTATE_90 if orientation is None else None
+        can_rotate = wc.prefer_horizontal < 1
+        if font_size >= wc.min_font_size:
+            free = self._fit(wc, word, font_size, orientation)
+            if free is None and can_rotate:
+                orientation = other
+                free = self._fit(wc, word, font_size, orientation)
+            if free is not None:
+                return self._sample(free, random_state), font_size, orientation
+
+        # smaller sizes are tried horizontally like in the stock loop, bisecting the number of
+        # font_step decrements instead of trying them one by one, the text box grows with the font size
+        steps = (font_size - wc.min_font_size) // wc.font_step
+        found = None
+        low, high = 1, steps
+        while low <= high:
+            middle = (low + high) // 2
+            if self._fit(wc, word, font_size - middle * wc.font_step, None) is not None:
+                found = middle
+                high = middle - 1
+            else:
+                low = middle + 1
+        if found is None:
+            return None, font_size - (steps + 1) * wc.font_step, None
+        font_size -= found * wc.font_step
+        free = self._fit(wc, word, font_size, None)  # the buffer holds the last size tried, query again
+        return self._sample(free, random_state), font_size, None
+
+    def _sample(self, free, random_state):
+        # the k-th free position, without listing all of them
+        row_counts = np.count_nonzero(free, axis=1)
+        k = random_state.randrange(int(row_counts.sum()))
+        cumulative = np.cumsum(row_counts)
+        row = int(np.searchsorted(cumulative, k, side='right'))
+        k -= int(cumulative[row - 1]) if row else 0
+        return row, int(np.flatnonzero(free[row])[k])
+
+    def draw_text(self, img_grey, draw, x, y, word, font, bbox):
+        # add the pixels the text changed to every table entry below and right of them
+        left = max(0, y + bbox[0])
+        top = max(0, x + bbox[1])
+        right = min(self.width, y + bbox[2])
+        bottom = min(self.height, x + bbox[3])
+        if right <= left or bottom <= top:
+            draw.text((y, x), word, fill="white", font=font)
+            return
+        before = np.asarray(img_grey.crop((left, top, right, bottom)), dtype=np.uint32)
+        draw.text((y, x), word, fill="white", font=font)
+        delta = np.asarray(img_grey.crop((left, top, right, bottom)), dtype=np.uint32) - before
+        delta = np.cumsum(np.cumsum(delta, axis=1), axis=0, dtype=np.uint32)
+        integral = self.integral
+        integral[top:bottom, left:right] += delta
+        integral[top:bottom, right:] += delta[:, -1:]
+        integral[bottom:, left:right] += delta[-1:, :]
+        integral[bottom:, right:] += delta[-1, -1]
+
+class _Canvas(object):
+    """Grey image of the placed words and its occupancy map, for either placement engine."""
+    def __init__(self, wc, engine):
+        from wordcloud.wordcloud import IntegralOccupancyMap
+
+        self.wc = wc
+        self.engine = engine
+        if wc.mask is not None:
+            self.boolean_mask = wc._get_bolean_mask(wc.mask)
+            width = wc.mask.shape[1]
+            height = wc.mask.shape[0]
+        else:
+            self.boolean_mask = None
+            height, width = wc.height, wc.width
+        if engine == 'numpy':
+            self.occupancy = VectorOccupancyMap(height, width, self.boolean_mask)
+        else:
+            self.occupancy = IntegralOccupancyMap(height, width, self.boolean_mask)
+        self.img_grey = Image.new("L", (width, height))
+        self.draw = ImageDraw.Draw(self.img_grey)
+
+    def find_position(self, word, font_size, orientation, random_state):
+        """(position, font_size, orientation) of the word, font_size below min_font_size if there is no room."""
+        wc = self.wc
+        if self.engine == 'numpy':
+            return self.occupancy.find_position(wc, word, font_size, orientation, random_state)
+        result = None
+        tried_other_orientation = False
+        while True:
+            if font_size < wc.min_font_size:
+                # font-size went too small
+                break
+            # try to find a position, the size of the text comes from the registry
+            box_size = text_bbox(wc.font_path, font_size, orientation, word)
+            # find possible places using integral image:
+            result = self.occupancy.sample_position(box_size[3] + wc.margin,
+                                                    box_size[2] + wc.margin,
+                                                    random_state)
+            if result is not None:
+                # Found a place
+                break
+            # if we didn't find a place, make font smaller
+            # but first try to rotate!
+            if not tried_other_orientation and wc.prefer_horizontal < 1:
+                orientation = (Image.ROTATE_90 if orientation is None else
+                               Image.ROTATE_90)
+                tried_other_orientation = True
+            else:
+                font_size -= wc.font_step
+                orientation = None
+        return result, font_size, orientation
+
+    def draw_word(self, word, font_size, orientation, x, y):
+        wc = self.wc
+        font = get_font(wc.font_path, font_size, orientation)
+        if self.engine == 'numpy':
+            self.occupancy.draw_text(self.img_grey, self.draw, x, y, word, font,
+                                     text_bbox(wc.font_path, font_size, orientation, word, anchor=None))
+            return
+        self.draw.text((y, x), word, fill="white", font=font)
+        # recompute integral image
+        if wc.mask is None:
+            img_array = np.asarray(self.img_grey)
+        else:
+            img_array = np.asarray(self.img_grey) + self.boolean_mask
+        # recompute bottom right
+        # the order of the cumsum's is important for speed ?!
+        self.occupancy.update(img_array, x, y)
+
+    def draw_words(self, layout):
+        # words kept from an earlier layout, the occupancy is computed once after drawing all of them
+        for (word, _), font_size, (x, y), orientation, _ in layout:
+            self.draw.text((y, x), word, fill="white", font=get_font(self.wc.font_path, font_size, orientation))
+        img_array = np.asarray(self.img_grey, dtype=np.uint32)
+        if self.boolean_mask is not None:
+            img_array = img_array + 255 * self.boolean_mask
+        integral = np.cumsum(np.cumsum(img_array, axis=1), axis=0)
+        self.occupancy.integral = integral.astype(self.occupancy.integral.dtype)
+
+def generate_from_frequencies(wc, frequencies, max_font_size=None, engine='wordcloud',  # noqa: C901
+                              progress=None, time_budget=0):
+    """wc.generate_from_frequencies(frequencies) with the placement engine, sets wc.layout_ and returns wc.
+
+    With engine 'wordcloud' the layout is the same as the stock one.
+    progress(placed, total, font_size) is called before every word, an exception raised by it cancels the placement.
+    With a time_budget in seconds the placement stops when it is used up, the layout has the words placed so far.
+    """
+    # make sure frequencies are sorted and normalized
+    frequencies = sorted(frequencies.items(), key=itemgetter(1), reverse=True)
+    if len(frequencies) <= 0:
+        raise ValueError("We need at least 1 word to plot a word cloud, "
+                         "got %d." % len(frequencies))
+    frequencies = frequencies[:wc.max_words]
+
+    # largest entry will be 1
+    max_frequency = float(frequencies[0][1])
+
+    frequencies = [(word, freq / max_frequency)
+                   for word, freq in frequencies]
+
+    if wc.random_state is not None:
+        random_state = wc.random_state
+    else:
+        random_state = Random()
+
+    # create image
+    canvas = _Canvas(wc, engine)
+    font_sizes, positions, orientations, colors = [], [], [], []
+
+    last_freq = 1.
+
+    if max_font_size is None:
+        # if not provided use default font_size
+        max_font_size = wc.max_font_size
+
+    if max_font_size is None:
+        # figure out a good font size by trying to draw with
+        # just the first two words
+        if len(frequencies) == 1:
+            # we only have one word. We make it big!
+            font_size = wc.height
+        else:
+            generate_from_frequencies(wc, dict(frequencies[:2]), max_font_size=wc.height, engine=engine)
+            # find font sizes
+            sizes = [x[1] for x in wc.layout_]
+            try:
+                font_size = int(2 * sizes[0] * sizes[1]
+                                / (sizes[0] + sizes[1]))
+            # quick fix for if wc.layout_ contains less than 2 values
+            # on very small images it can be empty
+            except IndexError:
+                try:
+                    font_size = sizes[0]
+                except IndexError:
+                    raise ValueError(
+                        "Couldn't find space to draw. Either the Canvas size"
+                        " is too small or too much of the image is masked "
+                        "out.")
+    else:
+        font_size = max_font_size
+
+    wc.words_ = dict(frequencies)
+
+    if wc.repeat and len(frequencies) < wc.max_words:
+        # pad frequencies with repeating words.
+        times_extend = int(np.ceil(wc.max_words / len(frequencies))) - 1
+        # get smallest frequency
+        frequencies_org = list(frequencies)
+        downweight = frequencies[-1][1]
+        for i in range(times_extend):
+            frequencies.extend([(word, freq * downweight ** (i + 1))
+                                for word, freq in frequencies_org])
+
+    deadline = time.monotonic() + time_budget if time_budget else None
+    # start drawing grey image
+    for word, freq in frequencies:
+        if progress is not None:
+            progress(len(positions), len(frequencies), font_size)
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        if freq == 0:
+            continue
+        # select the font size
+        rs = wc.relative_scaling
+        if rs != 0:
+            font_size = int(round((rs * (freq / float(last_freq))
+                                   + (1 - rs)) * font_size))
+        if random_state.random() < wc.prefer_horizontal:
+            orientation = None
+        else:
+            orientation = Image.ROTATE_90
+        result, font_size, orientation = canvas.find_position(word, font_size, orientation, random_state)
+
+        if font_size < wc.min_font_size:
+            # we were unable to draw any more
+            break
+
+        x, y = np.array(result) + wc.margin // 2
+        # actually draw the text
+        canvas.draw_word(word, font_size, orientation, x, y)
+        positions.append((x, y))
+        orientations.append(orientation)
+        font_sizes.append(font_size)
+        colors.append(wc.color_func(word, font_size=font_size,
+                                    position=(x, y),
+                                    orientation=orientation,
+                                    random_state=random_state,
+                                    font_path=wc.font_path))
+        last_freq = freq
+
+    wc.layout_ = list(zip(frequencies, font_sizes, positions,
+                          orientations, colors))
+    return wc
+
+# a kept word stays as it is while its target size moves by at most this fraction
+RESIZE_TOLERANCE = 0.2
+
+def target_sizes(frequencies, font_size, relative_scaling):
+    """Font size of every (word, normalized frequency) as the placement starts it, before shrinking to fit."""
+    sizes = []
+    last_freq = 1.
+    for word, freq in frequencies:
+        if relative_scaling != 0 and freq != 0:
+            font_size = int(round((relative_scaling * (freq / float(last_freq))
+                                   + (1 - relative_scaling)) * font_size))
+            last_freq = freq
+        sizes.append(font_size)
+    return sizes
+
+def update_layout(wc, frequencies, previous_layout, engine='wordcloud', progress=None, time_budget=0):
+    """Layout of frequencies keeping the words of previous_layout in place, sets wc.layout_ and returns wc.
+
+    Words still among the max_words most frequent keep position, size, orientation and color while their
+    target size changes by at most RESIZE_TOLERANCE. New and resized words are placed into the free space,
+    so the work is proportional to the change. With repeat the layout is generated again.
+    """
+    if not previous_layout or wc.repeat:
+        return generate_from_frequencies(wc, frequencies, engine=engine, progress=progress, time_budget=time_budget)
+
+    frequencies = sorted(frequencies.items(), key=itemgetter(1), reverse=True)[:wc.max_words]
+    if len(frequencies) <= 0:
+        raise ValueError("We need at least 1 word to plot a word cloud, "
+                         "got %d." % len(frequencies))
+    max_frequency = float(frequencies[0][1])
+    frequencies = [(word, freq / max_frequency) for word, freq in frequencies]
+    random_state = wc.random_state if wc.random_state is not None else Random()
+
+    rs = wc.relative_scaling
+    font_size = wc.max_font_size or max(x[1] for x in previous_layout)
+    previous_words = [x[0] for x in previous_layout]
+    previous_targets = dict(zip([word for word, _ in previous_words], target_sizes(previous_words, font_size, rs)))
+    targets = target_sizes(frequencies, font_size, rs)
+    previous = {x[0][0]: x for x in previous_layout}
+    kept = {}
+    for (word, _), target in zip(frequencies, targets):
+        if word in previous and abs(target - previous_targets[word]) <= RESIZE_TOLERANCE * previous_targets[word]:
+            kept[word] = previous[word]
+
+    canvas = _Canvas(wc, engine)
+    canvas.draw_words(kept.values())
+    wc.words_ = dict(frequencies)
+    deadline = time.monotonic() + time_budget if time_budget else None
+    full = False
+    layout = []
+    last_size = last_freq = None
+    for i, ((word, freq), font_size) in enumerate(zip(frequencies, targets)):
+        entry = kept.get(word)
+        if entry is not None:
+            layout.append(((word, freq),) + tuple(entry[1:]))
+            continue
+        if full:
+            continue
+        if progress is not None:
+            progress(i, len(frequencies), font_size)
+        if freq == 0 or (deadline is not None and time.monotonic() > deadline):
+            full = True
+            continue
+        if last_size is not None and rs != 0:
+            # like the full placement, start from the size the last new word had to shrink to,
+            # instead of stepping down from the target again in the space left between kept words
+            font_size = min(font_size, int(round((rs * (freq / last_freq) + (1 - rs)) * last_size)))
+        if random_state.random() < wc.prefer_horizontal:
+            orientation = None
+        else:
+            orientation = Image.ROTATE_90
+        result, font_size, orientation = canvas.find_position(word, font_size, orientation, random_state)
+        if font_size < wc.min_font_size:
+            # like the full placement, no new words after the first one that does not fit
+            full = True
+            continue
+        last_size, last_freq = font_size, freq
+        x, y = np.array(result) + wc.margin // 2
+        canvas.draw_word(word, font_size, orientation, x, y)
+        layout.append(((word, freq), font_size, (x, y), orientation,
+                       wc.color_func(word, font_size=font_size, position=(x, y), orientation=orientation,
+                                     random_state=random_state, font_path=wc.font_path)))
+    wc.layout_ = layout
+    return wc
+
+# which of several candidate layouts is kept, 'all' keeps every one
+PICK_MODES = ['all', 'words_placed', 'coverage', 'largest_word']
+
+def layout_scores(layout, font_path, words, free_pixels):
+    """Cheap measures of a layout, higher is better.
+
+    words_placed is the fraction of the words placed, coverage the fraction of the free pixels covered by the
+    boxes of the words and largest_word the largest font size.
+    """
+    area = 0
+    for (word, _), font_size, _, orientation, _ in layout:
+        box = text_bbox(font_path, font_size, orientation, word, anchor=None)
+        area += (box[2] - box[0]) * (box[3] - box[1])
+    return {'words_placed': len(layout) / max(words, 1), 'coverage': area / max(free_pixels, 1),
+            'largest_word': max((x[1] for x in layout), default=0)}
+
+def scale_layout(layout, ratio_y, ratio_x, font_path):
+    """A layout placed on a smaller canvas, mapped to one ratio times larger.
+
+    Positions are truncated like WordCloud draws a layout with scale. The glyphs don't grow in proportion
+    to the font size, every word gets the largest font size up to the smaller ratio that stays inside
+    its box on the smaller canvas times the ratios, so the words don't grow into each other.
+    """
+    ratio = min(ratio_y, ratio_x)
+    return [(word_freq, fitted_font_size(font_path, font_size, orientation, word_freq[0], int(font_size * ratio), ratio_y, ratio_x),
+             (int(position[0] * ratio_y), int(position[1] * ratio_x)), orientation, color)
+            for word_freq, font_size, position, orientation, color in layout]
+
+def fitted_font_size(font_path, font_size, orientation, word, size, ratio_y, ratio_x):
+    # font size at most size whose box fits the box of font_size scaled by the ratios
+    x0, y0, x1, y1 = text_bbox(font_path, font_size, orientation, word, anchor=None)
+    left, top, right, bottom = x0 * ratio_x, y0 * ratio_y, x1 * ratio_x, y1 * ratio_y
+    while size > 1:
+        x0, y0, x1, y1 = text_bbox(font_path, size, orientation, word, anchor=None)
+        if x0 >= left and y0 >= top and x1 <= right and y1 <= bottom:
+            break
+        # near the fitting size in one step, then one by one
+        fit = min((right - left) / max(1, x1 - x0), (bottom - top) / max(1, y1 - y0))
+        size = max(1, min(size - 1, int(size * fit)))
+    return size
+
+def draw_band(wc, top, bottom):
+    """Rows top to bottom of to_image(wc, contour=False), only the words reaching into them are drawn."""
+    if wc.mask is not None:
+        width = wc.mask.shape[1]
+    else:
+        width = wc.width
+
+    img = Image.new(wc.mode, (int(width * wc.scale), bottom - top), wc.background_color)
+    draw = ImageDraw.Draw(img)
+    for (word, count), font_size, position, orientation, color in wc.layout_:
+        font_size = int(font_size * wc.scale)
+        if font_size < 1:
+            continue  # a preview scale below 1 leaves the smallest words under a pixel
+        x, y = int(position[1] * wc.scale), int(position[0] * wc.scale)
+        box = text_bbox(wc.font_path, font_size, orientation, word, anchor=None)
+        if y + box[3] <= top or y + box[1] >= bottom:
+            continue
+        draw.text((x, y - top), word, fill=color, font=get_font(wc.font_path, font_size, orientation))
+    return img
+
+def to_image(wc, contour=True):
+    """wc.to_image() with fonts from the registry, without the contour of the mask if contour is False."""
+    wc._check_generated()
+    if wc.mask is not None:
+        width = wc.mask.shape[1]
+        height = wc.mask.shape[0]
+    else:
+        height, width = wc.height, wc.width
+
+    img = Image.new(wc.mode, (int(width * wc.scale),
+                              int(height * wc.scale)),
+                    wc.background_color)
+    draw = ImageDraw.Draw(img)
+    for (word, count), font_size, position, orientation, color in wc.layout_:
+        font_size = int(font_size * wc.scale)
+        if font_size < 1:
+            continue  # a preview scale below 1 leaves the smallest words under a pixel
+        transposed_font = get_font(wc.font_path, font_size, orientation)
+        pos = (int(position[1] * wc.scale),
+               int(position[0] * wc.scale))
+        draw.text(pos, word, fill=color, font=transposed_font)
+
+    if not contour:
+        return img
+    return wc._draw_contour(img=img)
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image, ImageColor, ImageFilter
+from wordcloud_cache import LRUCache
+from wordcloud_imagefunc import tensor2np, np_whitebackground
+from wordcloud_stats import null_timings
+
+# Binarized masks and their contour layers, kept by a digest of the mask_image tensor, so a mask reused
+# for many texts is converted and traced once. The contour is the one WordCloud._draw_contour draws.
+
+MASK_CACHE_SIZE = 16
+CONTOUR_CACHE_SIZE = 32
+mask_cache = LRUCache('mask', MASK_CACHE_SIZE)
+contour_cache = LRUCache('contour', CONTOUR_CACHE_SIZE)
+
+_lock = threading.Lock()
+_known_tensors = OrderedDict()  # id(tensor) -> (tensor, version, digest), ComfyUI passes the same tensor again
+_KNOWN_TENSORS_SIZE = 8
+
+def tensor_digest(image):
+    """Digest of an IMAGE tensor, hashed again only for a new tensor or after an in-place change."""
+    entry = _known_tensors.get(id(image))
+    if entry is not None and entry[0] is image and entry[1] == image._version:
+        return entry[2]
+    array = np.ascontiguousarray(image.detach().cpu().numpy())
+    h = hashlib.sha1(repr((array.shape, array.dtype.str)).encode('utf-8'))
+    h.update(array.data)
+    digest = h.hexdigest()
+    with _lock:
+        # the entry keeps the tensor alive, so its id can't be reused by another one
+        _known_tensors[id(image)] = (image, image._version, digest)
+        _known_tensors.move_to_end(id(image))
+        while len(_known_tensors) > _KNOWN_TENSORS_SIZE:
+            _known_tensors.popitem(last=False)
+    return digest
+
+def binarize(array):
+    """uint8 (..., height, width, channels) images to (..., height, width) masks, 255 where white after flattening onto white."""
+    return np.all(np_whitebackground(array) == 255, axis=-1).astype(np.uint8) * 255
+
+def prepare_masks(mask_image, timings=null_timings):
+    """(keys, masks) of the batch items of a mask_image tensor, ([None], [None]) without mask.
+
+    The masks are what WordCloud takes as mask: 255 is masked out, 0 is free for words.
+    """
+    if mask_image is None:
+        return [None], [None]
+    digest = tensor_digest(mask_image)
+    masks = mask_cache.get(digest)
+    if masks is None:
+        timings.count('mask_cache_misses')
+        masks = list(binarize(tensor2np(mask_image)))
+        mask_cache.put(digest, masks)
+    else:
+        timings.count('mask_cache_hits')
+    return [f'{digest}:{i}' for i in range(len(masks))], masks
+
+def shrink_mask(mask, size, mask_key=None):
+    """(key, mask) of a mask shrunk to size (height, width), masked where any pixel it covers is masked.
+
+    Words placed on the smaller mask stay inside the free area of the full size one.
+    """
+    key = None if mask_key is None else f'{mask_key}@{size[0]}x{size[1]}'
+    small = mask_cache.get(key) if key is not None else None
+    if small is None:
+        rows = np.arange(size[0]) * mask.shape[0] // size[0]
+        cols = np.arange(size[1]) * mask.shape[1] // size[1]
+        small = np.maximum.reduceat(np.maximum.reduceat(mask, rows, axis=0), cols, axis=1)
+        if key is not None:
+            mask_cache.put(key, small)
+    return key, small
+
+def find_edges(image):
+    # ImageFilter.FIND_EDGES: 8 * pixel - its 8 neighbours, clipped, the border is left 0
+    a = np.asarray(image, dtype=np.int16)
+    rows = a[:, :-2] + a[:, 1:-1] + a[:, 2:]
+    edges = np.zeros(a.shape, dtype=np.uint8)
+    np.clip(9 * a[1:-1, 1:-1] - (rows[:-2] + rows[1:-1] + rows[2:]), 0, 255, out=edges[1:-1, 1:-1], casting='unsafe')
+    return edges
+
+def contour_pixels(mask, size, contour_width):
+    """Flat indices of the contour pixels on a canvas of size (width, height)."""
+    contour = Image.fromarray(mask).resize(size)
+    # the gaussian changes the width, divided by 10 for more resolution
+    contour = Image.fromarray(find_edges(contour)).filter(ImageFilter.GaussianBlur(radius=contour_width / 10))
+    return np.flatnonzero(np.asarray(contour))
+
+def contour_layer(mask, size, contour_width, mask_key=None):
+    """contour_pixels(), kept in contour_cache when the mask has a key."""
+    key = None if mask_key is None else (mask_key, size[0], size[1], contour_width)
+    pixels = contour_cache.get(key) if key is not None else None
+    if pixels is None:
+        pixels = contour_pixels(mask, size, contour_width)
+        if key is not None:
+            contour_cache.put(key, pixels)
+    return pixels
+
+def contour_rgba(contour_color):
+    # opaque, visible on a transparent background too
+    return ImageColor.getrgb(contour_color)[:3] + (255,)
+
+def draw_contour(image, mask, contour_width, contour_color, mask_key=None):
+    """Draw the contour of mask onto a RGB or RGBA uint8 array, returns a new array."""
+    if mask is None or contour_width == 0:
+        return image
+    height, width = image.shape[:2]
+    pixels = contour_layer(mask, (width, height), contour_width, mask_key)
+    color = contour_rgba(contour_color)[:image.shape[2]]
+    image = image.copy()
+    image.reshape(-1, image.shape[2])[pixels] = color
+    return image
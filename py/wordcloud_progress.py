@@ -0,0 +1,69 @@
+import time
+
+# Progress of the word placement shown on the node, and ComfyUI's interrupt checked between words.
+# update_node_status comes from dzNodes.py in the plugin package, __init__.py passes it in with set_status_sender().
+# comfy is imported on first use, without ComfyUI (benchmarks, worker processes) there is nothing to interrupt.
+
+_update_node_status = None
+_UNRESOLVED = object()
+_model_management = _UNRESOLVED  # comfy.model_management, None outside ComfyUI
+
+def set_status_sender(update_node_status):
+    global _update_node_status
+    _update_node_status = update_node_status
+
+def _comfy_model_management():
+    # resolved once, a failed import is not retried before every placed word
+    global _model_management
+    if _model_management is _UNRESOLVED:
+        try:
+            import comfy.model_management as model_management
+        except ImportError:
+            model_management = None
+        _model_management = model_management
+    return _model_management
+
+def throw_if_interrupted():
+    # raises ComfyUI's InterruptProcessingException, the prompt ends as interrupted and not as failed
+    model_management = _comfy_model_management()
+    if model_management is not None:
+        model_management.throw_exception_if_processing_interrupted()
+
+class NodeProgress(object):
+    """Status text and progress bar of one node for a batch of count images, sent at most every interval seconds."""
+    def __init__(self, node, count=1, interval=0.25):
+        self.node = node
+        self.count = count
+        self.interval = interval
+        self._last = 0
+        self._done = None
+
+    def send(self, text, progress=None, force=False):
+        if _update_node_status is None or self.node is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        try:
+            _update_node_status(None, self.node, text, progress)
+        except Exception:
+            pass  # a closed browser tab must not fail the prompt
+
+    def placement(self, index):
+        """Callback for wordcloud_layout.generate_from_frequencies, placing image index of the batch."""
+        def progress(placed, total, font_size):
+            throw_if_interrupted()
+            prefix = f'{index + 1}/{self.count}: ' if self.count > 1 else ''
+            self.send(f'{prefix}{placed}/{total} words, font size {font_size}',
+                      (index + placed / max(total, 1)) / self.count)
+        return progress
+
+    def images_done(self, done):
+        throw_if_interrupted()
+        if done != self._done:
+            self._done = done
+            self.send(f'{done}/{self.count} images', done / self.count, force=True)
+
+    def finish(self):
+        self.send(None, None, force=True)
@@ -0,0 +1,42 @@
+import time
+from contextlib import contextmanager
+
+# Stage durations and counters of one Word Cloud execution, for its stats output and log line.
+# Only a handful of stages per image are timed, a disabled instance does not even read the clock.
+
+class Timings(object):
+    """Seconds per stage and counters, added up over the images of a batch."""
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other):
+        # timings of an image rendered by a worker process
+        if not self.enabled:
+            return
+        for name, value in other.stages.items():
+            self.stages[name] = self.stages.get(name, 0) + value
+        for name, value in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self):
+        return {'stages': {k: round(v, 6) for k, v in self.stages.items()}, 'counters': dict(self.counters)}
+
+# default of the functions taking timings, records nothing
+null_timings = Timings(enabled=False)
@@ -0,0 +1,172 @@
+import io
+import os
+import html
+import base64
+import functools
+import numpy as np
+from wordcloud_fonts import get_font
+from wordcloud_mask import contour_pixels
+
+# WordCloud.to_svg with fonts from the registry, plus the contour of the mask as a path.
+# Nothing is rasterized, the size of the SVG only depends on the number of words and the mask outline.
+
+def font_style(font_path, font_size):
+    """(font-family, font-weight, font-style) of a font file, as to_svg writes them."""
+    family, style = get_font(font_path, font_size).font.getname()
+    style = style.lower()
+    weight = 'bold' if 'bold' in style else 'normal'
+    if 'italic' in style:
+        slant = 'italic'
+    elif 'oblique' in style:
+        slant = 'oblique'
+    else:
+        slant = 'normal'
+    return repr(family), weight, slant
+
+def embedded_font(font_path, text):
+    """Subset of the font with the characters of text, a WOFF data url. Needs fontTools."""
+    import fontTools.subset
+    import fontTools.ttLib
+    options = fontTools.subset.Options(hinting=False, desubroutinize=True, ignore_missing_glyphs=True)
+    ttf = fontTools.subset.load_font(font_path, options)
+    subsetter = fontTools.subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(ttf)
+    ttf.flavor = 'woff'
+    buffer = io.BytesIO()
+    ttf.save(buffer)
+    return 'data:application/font-woff;charset=utf-8;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+@functools.lru_cache(maxsize=64)
+def contour_stroke(contour_width):
+    """Width in pixels of the contour draw_contour draws along a straight edge."""
+    if contour_width > 200:
+        # the blurred edge grows by half the contour width
+        return contour_width / 2
+    size = int(contour_width) + 16
+    strip = np.zeros((size, size), dtype=np.uint8)
+    strip[:, :size // 2] = 255
+    row = np.asarray(contour_pixels(strip, (size, size), contour_width)) // size
+    return max(1, int(np.count_nonzero(row == size // 2)))
+
+def trace_outline(mask):
+    """Outline of a 0/255 mask as polylines of (x, y) points, on the pixel borders between masked and free.
+
+    Marching squares on the 2x2 cells of pixel centers, the segments are joined into polylines and
+    the points in between straight runs dropped. The border of the image has no outline.
+    """
+    a = mask > 127
+    tl, tr, bl, br = a[:-1, :-1], a[:-1, 1:], a[1:, :-1], a[1:, 1:]
+    # the crossed sides of every cell, their midpoints in doubled coordinates to stay integer
+    sides = dict(top=tl != tr, bottom=bl != br, left=tl != bl, right=tr != br)
+    offsets = dict(top=(2, 1), bottom=(2, 3), left=(1, 2), right=(3, 2))
+    saddle = sides['top'] & sides['bottom'] & sides['left'] & sides['right']
+    segments = []
+    for first, second in [('top', 'bottom'), ('left', 'right'), ('top', 'left'),
+                          ('top', 'right'), ('bottom', 'left'), ('bottom', 'right')]:
+        cells = sides[first] & sides[second] & ~saddle
+        if (first, second) in (('top', 'left'), ('bottom', 'right')):
+            # a saddle cuts off the two corners of the color of the top left pixel
+            cells |= saddle & tl
+        elif (first, second) in (('top', 'right'), ('bottom', 'left')):
+            cells |= saddle & ~tl
+        ys, xs = np.nonzero(cells)
+        ys, xs = (ys * 2).tolist(), (xs * 2).tolist()
+        (dx0, dy0), (dx1, dy1) = offsets[first], offsets[second]
+        segments.extend(((x + dx0, y + dy0), (x + dx1, y + dy1)) for x, y in zip(xs, ys))
+
+    ends = {}
+    for i, (p, q) in enumerate(segments):
+        ends.setdefault(p, []).append(i)
+        ends.setdefault(q, []).append(i)
+    used = bytearray(len(segments))
+    lines = []
+    # open lines start at a point with one segment, closed ones anywhere
+    starts = [i for points in ends.values() if len(points) == 1 for i in points] + list(range(len(segments)))
+    for start in starts:
+        if used[start]:
+            continue
+        p, q = segments[start]
+        if len(ends[p]) != 1 and len(ends[q]) == 1:
+            p, q = q, p
+        used[start] = 1
+        line = [p, q]
+        while True:
+            following = [i for i in ends[line[-1]] if not used[i]]
+            if not following:
+                break
+            used[following[0]] = 1
+            a0, a1 = segments[following[0]]
+            line.append(a1 if a0 == line[-1] else a0)
+        lines.append(simplify(line))
+    return [[(x / 2, y / 2) for x, y in line] for line in lines]
+
+def simplify(line):
+    # keep the points where the direction changes
+    points = [line[0]]
+    for i in range(1, len(line) - 1):
+        (x0, y0), (x1, y1), (x2, y2) = points[-1], line[i], line[i + 1]
+        if (x1 - x0) * (y2 - y1) != (y1 - y0) * (x2 - x1):
+            points.append(line[i])
+    points.append(line[-1])
+    return points
+
+def outline_path(mask, scale):
+    """SVG path data of trace_outline(mask), scaled to the image."""
+    def point(p):
+        return '%g %g' % (p[0] * scale, p[1] * scale)
+    return ''.join('M' + point(line[0]) + 'L' + ' '.join(point(p) for p in line[1:]) for line in trace_outline(mask))
+
+def to_svg(wc, embed_font=False):
+    """SVG string of a WordCloud with its layout and colors, like wc.to_svg() but drawn as to_image does.
+
+    The words are placed with the integer font sizes and positions of the raster, the contour of the
+    mask is a stroked path as wide as the raster contour. embed_font includes a subset of the font.
+    """
+    wc._check_generated()
+    if wc.mask is not None:
+        height, width = wc.mask.shape[:2]
+    else:
+        height, width = wc.height, wc.width
+    max_font_size = wc.max_font_size or max(w[1] for w in wc.layout_)
+    family, weight, slant = font_style(wc.font_path, max(1, int(max_font_size * wc.scale)))
+
+    result = ['<svg xmlns="http://www.w3.org/2000/svg" width="{}" height="{}">'.format(
+        int(width * wc.scale), int(height * wc.scale))]
+    if embed_font:
+        text = ''.join({c for (word, _), *_ in wc.layout_ for c in word})
+        result.append('<style>@font-face{{font-family:{};font-weight:{};font-style:{};src:url("{}")format("woff");}}</style>'
+                      .format(family, weight, slant, embedded_font(wc.font_path, text)))
+    result.append('<style>text{{font-family:{};font-weight:{};font-style:{};}}</style>'.format(family, weight, slant))
+    if wc.background_color is not None:
+        result.append('<rect width="100%" height="100%" style="fill:{}"></rect>'.format(wc.background_color))
+
+    for (word, _), font_size, (y, x), orientation, color in wc.layout_:
+        font_size = int(font_size * wc.scale)
+        if font_size < 1:
+            continue  # a scale below 1 leaves the smallest words under a pixel
+        x, y = int(x * wc.scale), int(y * wc.scale)
+        font = get_font(wc.font_path, font_size).font
+        (size_x, size_y), (offset_x, offset_y) = font.font.getsize(word)
+        ascent, descent = font.getmetrics()
+        min_x, max_x, max_y = -offset_x, size_x - offset_x, ascent - offset_y
+        if orientation is not None:
+            # Image.ROTATE_90, the only rotation of wordcloud
+            transform = 'translate({},{}) rotate(-90)'.format(x + max_y, y + max_x - min_x)
+        else:
+            transform = 'translate({},{})'.format(x + min_x, y + max_y)
+        result.append('<text transform="{}" font-size="{}" style="fill:{}">{}</text>'.format(
+            transform, font_size, color, html.escape(word, quote=False)))
+
+    if wc.mask is not None and wc.contour_width != 0:
+        result.append('<path d="{}" style="fill:none;stroke:{};stroke-width:{:g};stroke-linecap:round;stroke-linejoin:round">'
+                      '</path>'.format(outline_path(wc.mask, wc.scale), wc.contour_color, contour_stroke(wc.contour_width)))
+    result.append('</svg>')
+    return '\n'.join(result)
+
+def svg_file_names(svg_path, count):
+    """svg_path for a single image, numbered files next to it for a batch."""
+    if count == 1:
+        return [svg_path]
+    name, ext = os.path.splitext(svg_path)
+    return [f'{name}_{i + 1:04d}{ext or ".svg"}' for i in range(count)]
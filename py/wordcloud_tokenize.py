@@ -0,0 +1,350 @@
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from operator import itemgetter
+from wordcloud_cache import LRUCache, frequency_key, get_frequencies, put_frequencies
+
+# Incremental version of WordCloud().process_text(), with the Chinese parts of the text segmented by jieba.
+# Counting is split from the final normalization, so text can be fed in chunks and
+# only the vocabulary is kept in memory. The result is the same dict process_text returns.
+# jieba and wordcloud are imported on first use, this module is loaded at ComfyUI start-up.
+
+WORD_PATTERN = re.compile(r"\w[\w']*")
+# the Han characters of jieba's re_han_default, text without them is not given to jieba
+HAN_PATTERN = re.compile('[\u4e00-\u9fd5]+')
+_LAST_SPACE = re.compile(r'.*\s', re.DOTALL)
+_SPACE = re.compile(r'\s')
+CHUNK_SIZE = 1024 * 1024  # characters
+PREVIEW_SIZE = 1000
+COLLOCATION_THRESHOLD = 30
+
+def has_han(text):
+    return HAN_PATTERN.search(text) is not None
+
+def iter_words(text, cut=None):
+    """Words of text, as process_text(' '.join(jieba.cut(text))) finds them for the Chinese parts.
+
+    Only the whitespace separated chunks with Han characters go through cut, jieba.cut by default, as jieba
+    splits at whitespace they are segmented the same as in the whole text. The rest is split by WORD_PATTERN
+    alone like WordCloud.process_text does, so "don't" and "café" stay one word and jieba is not loaded
+    for text without Chinese.
+    """
+    pos = 0
+    while True:
+        match = HAN_PATTERN.search(text, pos)
+        if match is None:
+            break
+        space = _LAST_SPACE.match(text, pos, match.start())
+        start = space.end() if space is not None else pos
+        space = _SPACE.search(text, match.end())
+        end = space.start() if space is not None else len(text)
+        yield from WORD_PATTERN.findall(text, pos, start)
+        if cut is None:
+            from jieba import cut
+        yield from WORD_PATTERN.findall(' '.join(cut(text[start:end])))
+        pos = end
+    yield from WORD_PATTERN.findall(text, pos)
+
+def text_identity(text, resources=None):
+    """The tokenizer settings the words of text depend on, part of the frequency cache key."""
+    if resources is not None:
+        return resources.identity
+    return jieba_identity() if has_han(text) else None
+
+def jieba_identity():
+    # the dictionary jieba segments with, part of the frequency cache key
+    import jieba
+    dictionary = jieba.dt.dictionary
+    if dictionary is None or not os.path.exists(dictionary):
+        return (jieba.__version__, 'default')
+    stat = os.stat(dictionary)
+    return (jieba.__version__, dictionary, stat.st_mtime_ns, stat.st_size)
+
+def loaded_jieba_identity():
+    # None until jieba is imported, nothing was segmented with it before
+    return jieba_identity() if 'jieba' in sys.modules else None
+
+def cached_counts(source, include_numbers, resources, count):
+    """count() of source, a file or corpus fingerprint, kept in the frequency cache.
+
+    count returns (value, whether the text has Han characters, whether all of the source was read), the
+    value of a partial read is returned without being kept. Without resources a text without Han
+    characters is kept under a key without tokenizer, one with them under jieba's identity and a marker
+    under the first key, so jieba is only imported for a text with Chinese.
+    """
+    if resources is not None:
+        key = frequency_key(source, bool(include_numbers), resources.identity)
+        value = get_frequencies(key)
+        if value is None:
+            value, _, complete = count()
+            if complete:
+                put_frequencies(key, value)
+        return value
+    key = frequency_key(source, bool(include_numbers), None)
+    han_key = frequency_key(source, bool(include_numbers), 'han')
+    value = get_frequencies(key)
+    if value is None and get_frequencies(han_key) is not None:
+        key = frequency_key(source, bool(include_numbers), jieba_identity())
+        value = get_frequencies(key)
+    if value is None:
+        value, han, complete = count()
+        if not complete:
+            return value
+        if han:
+            put_frequencies(han_key, {})
+            key = frequency_key(source, bool(include_numbers), jieba_identity())
+        put_frequencies(key, value)
+    return value
+
+# A jieba user dictionary and stopword files, loaded once and kept by the fingerprints of the files.
+# The stopwords are dropped while counting, like WordCloud's own STOPWORDS. A resource pickles as its
+# paths, a worker process loads it into its own cache on first use.
+
+TOKENIZER_CACHE_SIZE = 4
+tokenizer_cache = LRUCache('tokenizer', TOKENIZER_CACHE_SIZE)
+
+def file_identity(path):
+    """(absolute path, mtime, size) of a resource file, None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def read_stopwords(path):
+    # one word per line, lines starting with # are comments
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return [x for x in (line.strip() for line in f) if x and not x.startswith('#')]
+
+class TokenizerResources(object):
+    """jieba tokenizer with a user dictionary and the stopwords to drop while counting.
+
+    user_dict lines are `word [frequency] [tag]` as for jieba.load_userdict. With replace_dictionary
+    it is the whole dictionary instead of jieba's default one, which is not loaded at all, and every
+    line needs a frequency.
+    """
+    def __init__(self, user_dict='', stopword_files=(), replace_dictionary=False):
+        import jieba
+        from wordcloud import STOPWORDS
+        self.user_dict = user_dict
+        self.stopword_files = tuple(stopword_files)
+        self.replace_dictionary = bool(replace_dictionary and user_dict)
+        if self.replace_dictionary:
+            self.tokenizer = jieba.Tokenizer(dictionary=user_dict)
+            self.tokenizer.initialize()
+        else:
+            self.tokenizer = jieba.Tokenizer()
+            self.tokenizer.initialize()
+            if user_dict:
+                self.tokenizer.load_userdict(user_dict)
+        words = set(STOPWORDS)
+        for path in self.stopword_files:
+            words.update(read_stopwords(path))
+        self.stopwords = frozenset(x.lower() for x in words)
+        # the frequency cache key, segmenting with other files gives other frequencies
+        self.identity = resources_identity(user_dict, self.stopword_files, self.replace_dictionary)
+
+    def __reduce__(self):
+        return load_tokenizer_resources, (self.user_dict, self.stopword_files, self.replace_dictionary)
+
+    def __repr__(self):
+        return f'tokenizer ({len(self.tokenizer.FREQ)} dictionary entries, {len(self.stopwords)} stopwords)'
+
+def resources_identity(user_dict='', stopword_files=(), replace_dictionary=False):
+    dictionary = file_identity(user_dict) if user_dict else None
+    if not replace_dictionary:
+        dictionary = (jieba_identity(), dictionary)
+    return (dictionary, bool(replace_dictionary), tuple(file_identity(x) for x in stopword_files))
+
+def load_tokenizer_resources(user_dict='', stopword_files=(), replace_dictionary=False):
+    """TokenizerResources of the files, loaded again only after one of them changed."""
+    stopword_files = tuple(stopword_files)
+    key = resources_identity(user_dict, stopword_files, replace_dictionary)
+    resources = tokenizer_cache.get(key)
+    if resources is None:
+        resources = TokenizerResources(user_dict, stopword_files, replace_dictionary)
+        tokenizer_cache.put(key, resources)
+    return resources
+
+def iter_text_chunks(f, chunk_size=CHUNK_SIZE):
+    """Read a text file in chunks of about chunk_size characters, cut only after whitespace.
+
+    jieba and the word pattern both split at whitespace, so the chunks tokenize like the whole text.
+    """
+    rest = ''
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            if rest:
+                yield rest
+            return
+        data = rest + data
+        cut = max(data.rfind(x) for x in ('\n', ' ', '\t', '\r', '　'))
+        if cut < 0:
+            rest = data  # no whitespace yet, keep reading
+            continue
+        rest = data[cut + 1:]
+        yield data[:cut + 1]
+
+class TokenCounter:
+    """Counts words and adjacent word pairs of a text fed in pieces."""
+    def __init__(self, include_numbers=False, stopwords=None, resources=None):
+        self.include_numbers = include_numbers
+        self.resources = resources
+        if resources is not None:
+            self.stopwords = resources.stopwords  # already lowercase, not copied for every chunk
+        else:
+            if stopwords is None:
+                from wordcloud import STOPWORDS as stopwords
+            self.stopwords = set(x.lower() for x in stopwords)
+        self.unigrams = Counter()
+        self.bigrams = Counter()
+        self.first = None  # first and last word, to join the pair at the border when merging
+        self.last = None
+        self.han = False  # segmented by jieba
+
+    def feed(self, text):
+        cut = self.resources.tokenizer.cut if self.resources is not None else None
+        self.han = self.han or has_han(text)
+        self.feed_words(iter_words(text, cut))
+
+    def feed_words(self, words):
+        stopwords = self.stopwords
+        unigrams = self.unigrams
+        bigrams = self.bigrams
+        last = self.last
+        for word in words:
+            # remove 's
+            if word.lower().endswith("'s"):
+                word = word[:-2]
+            # remove numbers
+            if not self.include_numbers and word.isdigit():
+                continue
+            if self.first is None:
+                self.first = word
+            if word.lower() in stopwords:
+                last = None
+                continue
+            unigrams[word] += 1
+            if last is not None:
+                bigrams[last + ' ' + word] += 1
+            last = word
+        self.last = last
+
+    def merge(self, other):
+        # other counted the text right after this one
+        if other.first is None:
+            return self
+        if self.last is not None and other.first.lower() not in self.stopwords:
+            self.bigrams[self.last + ' ' + other.first] += 1
+        if self.first is None:
+            self.first = other.first
+        self.han = self.han or other.han
+        self.unigrams.update(other.unigrams)
+        self.bigrams.update(other.bigrams)
+        self.last = other.last
+        return self
+
+    def frequencies(self, normalize_plurals=True, collocation_threshold=COLLOCATION_THRESHOLD):
+        """Word frequencies as WordCloud.process_text returns them, collocations included."""
+        from wordcloud.tokenization import score
+        n_words = sum(self.unigrams.values())
+        counts_unigrams, standard_form = process_token_counts(self.unigrams, normalize_plurals)
+        counts_bigrams, _ = process_token_counts(self.bigrams, normalize_plurals)
+        orig_counts = counts_unigrams.copy()
+
+        for bigram_string, count in counts_bigrams.items():
+            bigram = tuple(bigram_string.split(" "))
+            word1 = standard_form[bigram[0].lower()]
+            word2 = standard_form[bigram[1].lower()]
+            collocation_score = score(count, orig_counts[word1], orig_counts[word2], n_words)
+            if collocation_score > collocation_threshold:
+                counts_unigrams[word1] -= counts_bigrams[bigram_string]
+                counts_unigrams[word2] -= counts_bigrams[bigram_string]
+                counts_unigrams[bigram_string] = counts_bigrams[bigram_string]
+        for word, count in list(counts_unigrams.items()):
+            if count <= 0:
+                del counts_unigrams[word]
+        return counts_unigrams
+
+def process_token_counts(counts, normalize_plurals=True):
+    """wordcloud.tokenization.process_tokens on a Counter instead of a list of words.
+
+    The Counter must be in order of first occurrence, ties are then resolved the same way.
+    """
+    d = defaultdict(dict)
+    for word, count in counts.items():
+        case_dict = d[word.lower()]
+        case_dict[word] = case_dict.get(word, 0) + count
+    merged_plurals = {}
+    if normalize_plurals:
+        # merge plurals into the singular count (simple cases only)
+        for key in list(d.keys()):
+            if key.endswith('s') and not key.endswith("ss"):
+                key_singular = key[:-1]
+                if key_singular in d:
+                    dict_plural = d[key]
+                    dict_singular = d[key_singular]
+                    for word, count in dict_plural.items():
+                        singular = word[:-1]
+                        dict_singular[singular] = dict_singular.get(singular, 0) + count
+                    merged_plurals[key] = key_singular
+                    del d[key]
+    fused_cases = {}
+    standard_cases = {}
+    item1 = itemgetter(1)
+    for word_lower, case_dict in d.items():
+        # Get the most popular case.
+        first = max(case_dict.items(), key=item1)[0]
+        fused_cases[first] = sum(case_dict.values())
+        standard_cases[word_lower] = first
+    for plural, singular in merged_plurals.items():
+        standard_cases[plural] = standard_cases[singular.lower()]
+    return fused_cases, standard_cases
+
+def count_file(path, include_numbers=False, encoding='utf-8', chunk_size=CHUNK_SIZE, resources=None):
+    """Word frequencies of a text file, read chunk by chunk.
+
+    Returns (frequencies, preview of the start, whether the text has Han characters).
+    """
+    counter = TokenCounter(include_numbers, resources=resources)
+    preview = None
+    with open(path, 'r', encoding=encoding) as f:
+        for chunk in iter_text_chunks(f, chunk_size):
+            if preview is None:
+                preview = chunk[:PREVIEW_SIZE]
+            counter.feed(chunk)
+    return counter.frequencies(), preview or '', counter.han
+
+def split_text(text, parts):
+    """Split text into about equal parts, at a line break if one is near, else at whitespace."""
+    step = len(text) // parts
+    chunks = []
+    start = 0
+    for i in range(1, parts):
+        pos = max(start, i * step)
+        cut = text.find('\n', pos, pos + step // 2)
+        if cut < 0:
+            match = _SPACE.search(text, pos)
+            if match is None:
+                break
+            cut = match.start()
+        chunks.append(text[start:cut + 1])
+        start = cut + 1
+    chunks.append(text[start:])
+    return [x for x in chunks if x]
+
+def count_chunk(text, include_numbers=False, resources=None):
+    counter = TokenCounter(include_numbers, resources=resources)
+    counter.feed(text)
+    return counter
+
+def count_text(text, include_numbers=False, executor=None, parts=1, resources=None):
+    """Word frequencies of text, its parts counted with executor.map and merged in order."""
+    chunks = split_text(text, parts)
+    map_func = map if executor is None else executor.map
+    counter = TokenCounter(include_numbers, resources=resources)
+    for x in map_func(count_chunk, chunks, [include_numbers] * len(chunks), [resources] * len(chunks)):
+        counter.merge(x)
+    return counter.frequencies()
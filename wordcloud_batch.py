@@ -0,0 +1,188 @@
+"""Word Cloud jobs from a JSONL file, without ComfyUI.
+
+Every line of the job file is one job, a json object with the inputs of the Word Cloud node. Missing
+inputs take the node defaults, besides:
+
+    name             output file name, without a directory, job_<line number> if not given
+    text_file        path of a text file, loaded with Load Text File instead of text (streaming is passed on)
+    mask_image       path of an image file
+    color_ref_image  path of an image file
+
+The jobs run on a pool of worker processes, one job per process at a time, each worker keeps jieba's
+dictionary, the fonts and the caches loaded from job to job. The images are written as they are done,
+<name>.png or <name>_0001.png... for a batch, or <name>.npz with uint8 image and mask arrays. A line of
+status, time and stage times per job goes to report.jsonl in the output directory.
+
+    python wordcloud_batch.py jobs.jsonl --output out
+    python wordcloud_batch.py jobs.jsonl --output out --workers 8 --format npz
+
+The exit code is 1 when a job failed.
+"""
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import functools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+plugin_dir = os.path.dirname(os.path.abspath(__file__))
+# the node modules need neither ComfyUI nor the server module of dzNodes.py
+sys.path.append(os.path.join(plugin_dir, 'py'))
+
+@functools.lru_cache(maxsize=None)
+def node_defaults(node_class):
+    """Default value of every input of a node, the first option of a list input."""
+    defaults = {}
+    inputs = node_class.INPUT_TYPES()
+    for section in ('required', 'optional'):
+        for name, spec in inputs.get(section, {}).items():
+            if isinstance(spec[0], (list, tuple)):
+                defaults[name] = spec[0][0] if spec[0] else None
+            elif len(spec) > 1 and 'default' in spec[1]:
+                defaults[name] = spec[1]['default']
+    return defaults
+
+def load_image(path):
+    from PIL import Image
+    from wordcloud_imagefunc import pil2tensor
+    image = Image.open(path)
+    return pil2tensor(image.convert('RGBA' if 'A' in image.getbands() else 'RGB'))
+
+def init_worker():
+    import wordcloud_engine
+    # the jobs run side by side, each in its own process
+    wordcloud_engine.max_workers = 1
+    with contextlib.redirect_stdout(io.StringIO()):
+        thread = wordcloud_engine.warm_up()
+        import torch  # the tensors of the outputs
+        thread.join()
+
+def save_images(image, mask, path, file_format):
+    import numpy as np
+    from PIL import Image
+    image = np.clip(image.numpy() * 255, 0, 255).astype(np.uint8)
+    mask = np.clip(mask.numpy() * 255, 0, 255).astype(np.uint8)
+    if file_format == 'npz':
+        np.savez(path + '.npz', image=image, mask=mask)
+        return [path + '.npz']
+    files = [path + '.png'] if len(image) == 1 else [f'{path}_{i + 1:04d}.png' for i in range(len(image))]
+    for array, file in zip(image, files):
+        Image.fromarray(array, 'RGBA' if array.shape[2] == 4 else 'RGB').save(file)
+    return files
+
+def check_name(name):
+    # the images are written to the output directory only
+    if name in ('', '.', '..') or any(x in name for x in '/\\:'):
+        raise ValueError(f'job name {name!r} must be a file name, without a directory')
+
+def load_text_file(path, streaming, include_numbers):
+    """(text, word_frequencies) of Load Text File, raises when the file has no words or no text."""
+    from load_textfile import LoadTextFile
+    # Load Text File only logs a missing or unreadable file and goes on with the demo text
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f'text_file {path} not found')
+    text, word_frequencies = LoadTextFile().load_text_file(path, streaming, include_numbers)['result']
+    if not (word_frequencies if streaming else text.strip()):
+        raise ValueError(f'no words in {path}, or it is not UTF-8')
+    return text, word_frequencies
+
+def run_job(job, output_dir, file_format):
+    """Run one job and write its images, returns its report line."""
+    from comfy_wordcloud import ComfyWordCloud
+    start = time.perf_counter()
+    report = dict(line=job['line'], name=job['name'])
+    try:
+        check_name(job['name'])
+        if 'first_line' in job:
+            raise ValueError(f'job name {job["name"]!r} is already used on line {job["first_line"]}')
+        with contextlib.redirect_stdout(io.StringIO()):  # the log lines of the nodes
+            kwargs = dict(node_defaults(ComfyWordCloud), **job['inputs'])
+            kwargs['collect_stats'] = True  # the stages of the report, also when the job sets it
+            if 'text_file' in kwargs:
+                streaming = kwargs.pop('streaming', False)
+                text, word_frequencies = load_text_file(kwargs.pop('text_file'), streaming, kwargs['include_numbers'])
+                kwargs['text'] = text
+                if streaming:
+                    # the text output is only a preview, without streaming the text keeps batch_separator working
+                    kwargs['word_frequencies'] = word_frequencies
+            for name in ('mask_image', 'color_ref_image'):
+                if isinstance(kwargs.get(name), str):
+                    kwargs[name] = load_image(kwargs[name])
+            image, mask, stats = ComfyWordCloud().wordcloud(**kwargs)
+        files = save_images(image, mask, os.path.join(output_dir, job['name']), file_format)
+        report.update(status='ok', images=image.shape[0], files=files,
+                      stages=json.loads(stats)['stages'])
+    except Exception as e:
+        report.update(status='error', error=repr(e))
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    return report
+
+def read_jobs(path):
+    # a later job with the name of an earlier one would overwrite its images, it fails instead
+    jobs = []
+    first_lines = {}
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            inputs = json.loads(line)
+            name = str(inputs.pop('name', f'job_{line_number:05d}'))
+            job = dict(line=line_number, name=name, inputs=inputs)
+            first_line = first_lines.setdefault(os.path.normcase(name), line_number)
+            if first_line != line_number:
+                job['first_line'] = first_line
+            jobs.append(job)
+    return jobs
+
+def main():
+    import wordcloud_engine
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('jobs', help='JSONL file, one job per line')
+    parser.add_argument('--output', default='wordcloud_output', help='directory of the images and the report')
+    parser.add_argument('--workers', type=int, default=wordcloud_engine.available_cpus(),
+                        help='worker processes, all CPUs by default')
+    parser.add_argument('--format', default='png', choices=['png', 'npz'])
+    args = parser.parse_args()
+
+    jobs = read_jobs(args.jobs)
+    os.makedirs(args.output, exist_ok=True)
+    report_path = os.path.join(args.output, 'report.jsonl')
+    workers = max(1, min(args.workers, len(jobs)))
+    print(f'{len(jobs)} jobs on {workers} workers')
+    start = time.perf_counter()
+    failed = 0
+    with open(report_path, 'w', encoding='utf-8') as report_file:
+        def done(report):
+            nonlocal failed
+            failed += report['status'] != 'ok'
+            report_file.write(json.dumps(report, ensure_ascii=False) + '\n')
+            report_file.flush()
+            print(f'{report["line"]:>6} {report["name"]:<24} {report["status"]:<6} {report["seconds"]:8.2f}s'
+                  + (f'  {report["error"]}' if 'error' in report else ''), flush=True)
+
+        if workers == 1:
+            init_worker()
+            for job in jobs:
+                done(run_job(job, args.output, args.format))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                futures = [pool.submit(run_job, job, args.output, args.format) for job in jobs]
+                try:
+                    for future in as_completed(futures):
+                        done(future.result())
+                except KeyboardInterrupt:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+    total = time.perf_counter() - start
+    print(f'{len(jobs) - failed} done, {failed} failed in {total:.1f}s, {len(jobs) / max(total, 1e-9):.2f} jobs/s. '
+          f'report: {report_path}')
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()